@@ -3,10 +3,11 @@ from config import Config
 from flask_login import current_user, login_required
 from dotenv import load_dotenv
 from flask_wtf.csrf import CSRFProtect, generate_csrf  # ✅ Add this line
-from app.extensions import db, login_manager, csrf, cache, mail  # ✅ Include mail
+from sqlalchemy.exc import SQLAlchemyError
+from app.extensions import db, login_manager, csrf, cache, mail, metrics  # ✅ Include mail
 from app.models import Resource
+from app.cache_backends import resolve_cache_type
 from .logging_config import setup_logging   # ✅ import your logging setup
-from prometheus_flask_exporter import PrometheusMetrics
 
 load_dotenv()
 
@@ -19,6 +20,7 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     csrf.init_app(app)
+    resolve_cache_type(app.config)
     cache.init_app(app)
     mail.init_app(app)  # ✅ Initialize Flask-Mail
 
@@ -39,7 +41,9 @@ def create_app():
     from app.routes.eps_screener import eps_bp
     # from routes.static_pages import static_pages
     from app.routes.vcp_screener import vcp_bp
+    from app.routes.jobs import jobs_bp
 
+    app.register_blueprint(jobs_bp)
     app.register_blueprint(vcp_bp, url_prefix="/vcp")
     app.register_blueprint(eps_bp, url_prefix="/eps")
     app.register_blueprint(stage2_delivery_bp)
@@ -80,9 +84,21 @@ def create_app():
     def inject_csrf_token():
         return dict(csrf_token=generate_csrf())
 
+    # Register flask CLI commands (benchmarks, maintenance jobs)
+    from app.cli import register_cli
+    register_cli(app)
+
     # ✅ Enable logging
     setup_logging(app)
-    metrics = PrometheusMetrics(app, path='/metrics', default=True)
+    metrics.init_app(app)
+
+    # 🧟 Jobs a previous process was running when it died are failed, not left spinning
+    from app.jobs import fail_stale_jobs
+    with app.app_context():
+        try:
+            fail_stale_jobs(app.config["JOB_TIMEOUT"])
+        except SQLAlchemyError:
+            db.session.rollback()  # database not reachable / jobs table not created yet
 
     return app
 #app = create_app()
@@ -0,0 +1,237 @@
+import json
+import os
+import re
+import threading
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# 📦 Local daily OHLCV store shared by all screeners
+#
+# One directory per symbol under data/bars/ holding raw column files
+# (date.i8 as datetime64[ns], open/high/low/close.f8, volume.i8) plus a
+# meta.json. Reads are numpy memmaps, so scanning thousands of symbols
+# keeps memory flat and only touches the pages a screener actually uses.
+
+BAR_STORE_DIR = os.getenv("BAR_STORE_DIR", os.path.join("data", "bars"))
+BACKFILL_PERIOD = "2y"  # covers the longest lookback (60 weeks) with room to spare
+CALENDAR_SYMBOL = "^NSEI"  # trading calendar used to find gaps in other symbols
+
+# Universe files synced by `flask sync-bars`, with their Yahoo suffix
+UNIVERSE_FILES = {
+    "data/nifty_200.csv": ".NS",
+    "data/nifty_500.csv": ".NS",
+    "data/nifty_750.csv": ".NS",
+    "data/MCAPge250cr.csv": ".NS",
+    "data/bse_200.csv": ".BO",
+}
+
+COLUMNS = {
+    "Open": ("open.f8", np.float64),
+    "High": ("high.f8", np.float64),
+    "Low": ("low.f8", np.float64),
+    "Close": ("close.f8", np.float64),
+    "Volume": ("volume.i8", np.int64),
+}
+DATE_FILE = "date.i8"
+
+_symbol_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _symbol_lock(symbol):
+    with _locks_guard:
+        return _symbol_locks.setdefault(symbol, threading.Lock())
+
+
+def _symbol_dir(symbol):
+    return os.path.join(BAR_STORE_DIR, re.sub(r"[^A-Za-z0-9._-]", "_", symbol))
+
+
+def read_meta(symbol):
+    path = os.path.join(_symbol_dir(symbol), "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_meta(symbol, meta):
+    path = os.path.join(_symbol_dir(symbol), "meta.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+def _normalize_index(df):
+    """Yahoo returns tz-aware timestamps; the store keeps naive trading dates."""
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df = df.copy()
+    df.index = index.normalize().rename("Date")
+    return df[~df.index.duplicated(keep="last")]
+
+
+# 💾 Replace a symbol's bars (columns first, meta last so readers never see a torn store)
+def write_bars(symbol, df, known_gaps=None):
+    folder = _symbol_dir(symbol)
+    os.makedirs(folder, exist_ok=True)
+
+    df = _normalize_index(df).sort_index()
+    index = df.index
+
+    arrays = {DATE_FILE: index.values.astype("M8[ns]").view(np.int64)}
+    for column, (filename, dtype) in COLUMNS.items():
+        values = df[column].to_numpy() if column in df else np.zeros(len(df))
+        arrays[filename] = np.nan_to_num(values, nan=0).astype(dtype) if dtype is np.int64 else values.astype(dtype)
+
+    for filename, values in arrays.items():
+        path = os.path.join(folder, filename)
+        values.tofile(path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    _write_meta(symbol, {
+        "symbol": symbol,
+        "rows": len(index),
+        "first_date": index[0].date().isoformat() if len(index) else None,
+        "last_date": index[-1].date().isoformat() if len(index) else None,
+        "synced_on": date.today().isoformat(),
+        "known_gaps": sorted(known_gaps or []),
+    })
+
+
+# 📖 Zero-copy, date-indexed view over the stored bars
+def read_bars(symbol, start=None):
+    meta = read_meta(symbol)
+    if not meta or not meta["rows"]:
+        return None
+
+    folder = _symbol_dir(symbol)
+    rows = meta["rows"]
+    dates = np.memmap(os.path.join(folder, DATE_FILE), dtype=np.int64, mode="r")[:rows].view("M8[ns]")
+
+    first = 0
+    if start is not None:
+        first = int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), "ns")))
+
+    columns = {
+        column: np.memmap(os.path.join(folder, filename), dtype=dtype, mode="r")[first:rows]
+        for column, (filename, dtype) in COLUMNS.items()
+    }
+    index = pd.DatetimeIndex(dates[first:], name="Date")
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def _download(symbol, session=None, start=None):
+    ticker = yf.Ticker(symbol, session=session)
+    if start is None:
+        return ticker.history(period=BACKFILL_PERIOD, interval="1d", auto_adjust=True)
+    end = date.today() + timedelta(days=1)
+    return ticker.history(start=start, end=end, interval="1d", auto_adjust=True)
+
+
+# 🕳 Trading days (per the calendar symbol) missing inside a symbol's stored range
+def find_gaps(symbol, stored, meta):
+    if symbol == CALENDAR_SYMBOL or stored.empty:
+        return []
+    calendar = read_bars(CALENDAR_SYMBOL, start=stored.index[0])
+    if calendar is None:
+        return []
+    missing = calendar.index[calendar.index <= stored.index[-1]].difference(stored.index)
+    known = set(meta.get("known_gaps", []))
+    return [d for d in missing if d.date().isoformat() not in known]
+
+
+# 🔄 Incremental sync: download only bars after the last stored date (plus any gaps)
+def sync_symbol(symbol, session=None, force=False):
+    """Bring a symbol's bars up to date. Returns the number of bars downloaded."""
+    with _symbol_lock(symbol):
+        meta = read_meta(symbol)
+        if meta and meta["synced_on"] == date.today().isoformat() and not force:
+            return 0
+
+        stored = read_bars(symbol) if meta and meta["rows"] else None
+        if stored is None:
+            hist = _download(symbol, session=session)
+            if hist.empty:
+                return 0
+            write_bars(symbol, hist)
+            return len(hist)
+
+        # Copy out of the memmaps - the files are replaced below
+        stored = stored.copy()
+        gaps = find_gaps(symbol, stored, meta)
+
+        # Re-fetch from the second-to-last bar: the last one may have been a
+        # partial intraday bar, and the one before it detects re-adjusted history
+        start = stored.index[-2] if len(stored) > 1 else stored.index[-1]
+        if gaps:
+            start = min(start, gaps[0])
+
+        new = _download(symbol, session=session, start=start.date())
+        if new.empty:
+            _write_meta(symbol, dict(meta, synced_on=date.today().isoformat()))
+            return 0
+        new = _normalize_index(new)[list(COLUMNS)]
+
+        # A split/dividend re-adjusts Yahoo's whole history -> backfill again
+        check = stored.index[-2] if len(stored) > 1 else None
+        if check is not None and check in new.index:
+            old_close, new_close = stored.at[check, "Close"], new.at[check, "Close"]
+            if old_close and abs(new_close - old_close) / old_close > 0.005:
+                hist = _download(symbol, session=session)
+                if not hist.empty:
+                    write_bars(symbol, hist)
+                    return len(hist) + len(new)
+
+        merged = pd.concat([stored[~stored.index.isin(new.index)], new]).sort_index()
+        unrepaired = [g.date().isoformat() for g in gaps if g not in new.index]
+        write_bars(symbol, merged, known_gaps=set(meta.get("known_gaps", [])) | set(unrepaired))
+        return len(new)
+
+
+def load_universe(path, suffix=".NS"):
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip().str.lower()
+    return [str(s).strip() + suffix for s in df["symbol"].dropna().unique()]
+
+
+# 🔁 Sync every symbol of the given universes; the calendar symbol goes first
+def sync_universe(symbols, session=None, force=False, progress=None):
+    symbols = [CALENDAR_SYMBOL] + [s for s in dict.fromkeys(symbols) if s != CALENDAR_SYMBOL]
+    fetched, failed = 0, []
+    for i, symbol in enumerate(symbols, start=1):
+        try:
+            fetched += sync_symbol(symbol, session=session, force=force)
+        except Exception as e:
+            print(f"Error syncing bars for {symbol}: {e}")
+            failed.append(symbol)
+        if progress:
+            progress(i, len(symbols))
+    return fetched, failed
+
+
+# 🔍 Accessor used by every screener: last `days` calendar days of daily bars
+def get_bars(symbol, days=None, session=None):
+    try:
+        sync_symbol(symbol, session=session)
+    except Exception as e:
+        print(f"Error syncing bars for {symbol}: {e}")
+
+    start = date.today() - timedelta(days=days) if days else None
+    bars = read_bars(symbol, start=start)
+    return bars if bars is not None else pd.DataFrame(columns=list(COLUMNS))
+
+
+# 📅 Weekly bars (Monday-labelled, like Yahoo's 1wk interval) built from the store
+def get_weekly_bars(symbol, weeks=60, session=None):
+    daily = get_bars(symbol, days=weeks * 7, session=session)
+    if daily.empty:
+        return daily
+    weekly = daily.resample("W-MON", label="left", closed="left").agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    )
+    return weekly.dropna(subset=["Close"])
@@ -0,0 +1,107 @@
+import os
+import pickle
+import sqlite3
+import time
+from contextlib import closing
+from flask_caching.backends.base import BaseCache
+
+# 🗄 Extra Flask-Caching backends
+#
+# SQLiteCache keeps every entry in one SQLite file (WAL mode), so all gunicorn
+# workers on the box share it and it survives restarts. Select it with
+# CACHE_TYPE=app.cache_backends.SQLiteCache; CACHE_THRESHOLD bounds its size.
+
+REDIS_CACHE_TYPES = {"RedisCache", "RedisClusterCache", "RedisSentinelCache"}
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, path, threshold=500, default_timeout=300):
+        BaseCache.__init__(self, default_timeout=default_timeout)
+        self.path = path
+        self._threshold = threshold
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        args.insert(0, config["CACHE_SQLITE_PATH"])
+        kwargs.update(threshold=config["CACHE_THRESHOLD"])
+        return cls(*args, **kwargs)
+
+    def _connect(self):
+        # autocommit; one short-lived connection per call keeps it process/thread safe
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout != 0 else 0
+
+    def get(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] != 0 and row[1] <= time.time()):
+            return None
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=None):
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                         (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout)))
+            self._prune(conn)
+        return True
+
+    def add(self, key, value, timeout=None):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires != 0 AND expires <= ?", (key, time.time()))
+            added = conn.execute("INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                                 (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires(timeout))).rowcount
+            if added:
+                self._prune(conn)
+        return bool(added)
+
+    def delete(self, key):
+        with closing(self._connect()) as conn:
+            return conn.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount > 0
+
+    def has(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT expires FROM cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and (row[0] == 0 or row[0] > time.time())
+
+    def clear(self):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM cache")
+        return True
+
+    # ✂️ Over the threshold: drop expired entries, then the ones closest to expiry
+    def _prune(self, conn):
+        if not self._threshold:
+            return
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self._threshold
+        if excess <= 0:
+            return
+        conn.execute("DELETE FROM cache WHERE expires != 0 AND expires <= ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self._threshold
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY expires = 0, expires LIMIT ?)", (excess,)
+            )
+
+
+# 🔌 Redis backends need the optional `redis` package - fall back to the filesystem cache without it
+def resolve_cache_type(config):
+    if config.get("CACHE_TYPE") not in REDIS_CACHE_TYPES:
+        return
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        print(f"CACHE_TYPE={config['CACHE_TYPE']} needs the redis package (pip install redis); "
+              "using FileSystemCache instead")
+        config["CACHE_TYPE"] = "FileSystemCache"
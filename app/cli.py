@@ -0,0 +1,377 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+import click
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, func, text, update
+from app.extensions import db
+from app.migrations import list_migrations, upgrade, status as migration_status
+from app.market_data import CountingSession, get_benchmark_weekly, load_weekly_panel
+from app.bar_store import UNIVERSE_FILES, load_universe, sync_universe
+
+
+def register_cli(app):
+
+    # ⏱ flask stage2-benchmark - per-symbol vs batched fetching
+    @app.cli.command("stage2-benchmark")
+    @click.option("--source", default="data/MCAPge250cr.csv", show_default=True, help="Universe CSV with a 'symbol' column.")
+    @click.option("--limit", default=200, show_default=True, help="Number of symbols to screen (0 = all).")
+    @click.option("--chunk-size", default=100, show_default=True, help="Symbols per yf.download call in batched mode.")
+    def stage2_benchmark(source, limit, chunk_size):
+        """Compare both Stage 2 fetch modes, then the per-symbol rules against the vectorized engine."""
+        from app.routes.screener import screen_stage2, evaluate_stage2
+        from app.routes.stage2_engine import rank_stage2, screen_stage2_panel
+
+        df = pd.read_csv(source)
+        symbols = [s + ".NS" for s in df["symbol"].dropna().unique()]
+        if limit:
+            symbols = symbols[:limit]
+
+        # Warm the shared benchmark cache so neither mode pays for it
+        get_benchmark_weekly("^NSEI")
+
+        picked = {}
+        for mode in ("per_symbol", "batched"):
+            session = CountingSession()
+            started = time.perf_counter()
+            results = screen_stage2(symbols, mode=mode, chunk_size=chunk_size, session=session)
+            elapsed = time.perf_counter() - started
+            picked[mode] = set(results["symbol"]) if not results.empty else set()
+            click.echo(f"{mode:<11} {len(symbols)} symbols  {elapsed:8.2f}s  "
+                       f"{session.request_count:5d} HTTP requests  {len(picked[mode])} in Stage 2")
+
+        if picked["per_symbol"] != picked["batched"]:
+            diff = sorted(picked["per_symbol"] ^ picked["batched"])
+            click.echo(f"⚠️ Modes disagree on {len(diff)} symbols: {', '.join(diff[:20])}")
+
+        # Rules only, on data already in memory: per-symbol loop vs vectorized engine
+        close, volume = load_weekly_panel(symbols)
+        index_df = get_benchmark_weekly("^NSEI")[["Close"]]
+
+        started = time.perf_counter()
+        rows = []
+        for symbol in close.columns:
+            stock_df = pd.DataFrame({"Close": close[symbol], "Volume": volume[symbol]}).dropna()
+            data = evaluate_stage2(symbol, stock_df, index_df)
+            if data:
+                rows.append(data)
+        looped = rank_stage2(pd.DataFrame(rows))
+        loop_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        vectorized = screen_stage2_panel(close, volume, index_df["Close"])
+        engine_elapsed = time.perf_counter() - started
+
+        click.echo(f"rules only  {close.shape[1]} symbols  loop {loop_elapsed * 1000:.1f} ms  "
+                   f"engine {engine_elapsed * 1000:.1f} ms")
+        try:
+            pd.testing.assert_frame_equal(looped, vectorized, check_dtype=False)
+        except AssertionError as e:
+            click.echo(f"⚠️ Engine differs from per-symbol rules: {e}")
+
+    # 🔄 flask sync-bars - incremental daily sync of the local bar store
+    @app.cli.command("sync-bars")
+    @click.option("--universe", "universes", multiple=True, help="Universe CSV to sync (repeatable). Defaults to all NIFTY/BSE lists.")
+    @click.option("--force", is_flag=True, help="Sync symbols already synced today.")
+    def sync_bars(universes, force):
+        """Download only the bars newer than each symbol's last stored date."""
+        files = {path: UNIVERSE_FILES.get(path, ".NS") for path in universes} if universes else UNIVERSE_FILES
+        symbols = []
+        for path, suffix in files.items():
+            symbols += load_universe(path, suffix)
+
+        session = CountingSession()
+        started = time.perf_counter()
+        fetched, failed = sync_universe(symbols, session=session, force=force)
+        elapsed = time.perf_counter() - started
+
+        click.echo(f"Synced {len(set(symbols))} symbols in {elapsed:.1f}s")
+        click.echo(f"  bars fetched : {fetched}")
+        click.echo(f"  HTTP requests: {session.request_count}")
+        click.echo(f"  bytes moved  : {session.bytes_received / 1024:.1f} KB")
+        if failed:
+            click.echo(f"  failed       : {len(failed)} ({', '.join(failed[:10])})")
+
+    # 🔁 flask rebuild-persistence - recompute days present / streaks from the history tables
+    @app.cli.command("rebuild-persistence")
+    def rebuild_persistence_command():
+        """Rebuild screener_persistence (run once after creating the table)."""
+        from app.persistence import SCREENER_MODELS, rebuild_persistence
+
+        for screener in SCREENER_MODELS:
+            click.echo(f"{screener:<16} {rebuild_persistence(screener)} symbols")
+
+    # 📅 flask rebuild-daily-pnl - regenerate user_daily_pnl from the trades table
+    @app.cli.command("rebuild-daily-pnl")
+    @click.option("--user-id", type=int, default=None, help="Only rebuild this user's rows.")
+    def rebuild_daily_pnl_command(user_id):
+        """Rebuild the per-user daily P&L rollup from closed trades."""
+        from app.daily_pnl import rebuild_daily_pnl
+
+        click.echo(f"Rebuilt {rebuild_daily_pnl(user_id)} user-day rows")
+
+    # 🧮 flask backfill-trade-aggregates / verify-trade-aggregates - Trade total_* columns
+    @app.cli.command("backfill-trade-aggregates")
+    def backfill_trade_aggregates():
+        """Recompute every trade's stored entry/exit aggregates."""
+        from app.models import Trade
+
+        totals = _trade_totals()
+        if totals:
+            db.session.execute(update(Trade), [dict(id=trade_id, **values) for trade_id, values in totals.items()])
+            db.session.commit()
+        click.echo(f"Backfilled {len(totals)} trades")
+
+    @app.cli.command("verify-trade-aggregates")
+    def verify_trade_aggregates():
+        """Compare stored aggregates with entries/exits; exits 1 if any trade drifted."""
+        from app.models import Trade
+
+        totals = _trade_totals()
+        drifted = []
+        for trade in Trade.query.all():
+            expected = totals[trade.id]
+            if any(abs((getattr(trade, column) or 0) - value) > 0.005 for column, value in expected.items()):
+                drifted.append(trade.id)
+
+        click.echo(f"Checked {len(totals)} trades, {len(drifted)} out of date")
+        if drifted:
+            click.echo(f"  trade ids: {', '.join(map(str, drifted[:50]))}")
+            click.echo("  run 'flask backfill-trade-aggregates' to fix them")
+            raise SystemExit(1)
+
+    # 🗂 flask db-upgrade / db-status - versioned SQL migrations
+    @app.cli.command("db-upgrade")
+    @click.option("--to", "target", type=int, default=None, help="Stop after this migration version.")
+    def db_upgrade(target):
+        """Apply pending migrations from app/db/migrations (PostgreSQL only)."""
+        if db.engine.dialect.name != "postgresql":
+            # The files use PostgreSQL-only syntax (ADD COLUMN IF NOT EXISTS, public.users, expression
+            # indexes); stop before the first one instead of leaving a half-migrated database
+            raise click.ClickException(
+                f"db-upgrade needs PostgreSQL, this database is {db.engine.dialect.name}. "
+                "Create SQLite databases from the models instead (db.create_all()), as the tests do."
+            )
+        applied = upgrade(db.engine, target=target)
+        click.echo(f"Applied {len(applied)} migration(s): {', '.join(map(str, applied)) or '-'}")
+
+    @app.cli.command("db-status")
+    def db_status():
+        """List migrations and when they were applied."""
+        for version, name, applied_at in migration_status(db.engine):
+            click.echo(f"{version:04d}  {name:<28} {applied_at or 'pending'}")
+
+    # 🔎 flask explain-hot-queries - query plans before/after the index migration
+    @app.cli.command("explain-hot-queries")
+    @click.option("--database-url", default=None, help="Empty scratch database to seed (default: a temporary SQLite file).")
+    @click.option("--trades", default=100_000, show_default=True, help="Number of trades to seed.")
+    @click.option("--users", default=20, show_default=True, help="Trades are spread over this many users.")
+    def explain_hot_queries(database_url, trades, users):
+        """Seed a scratch journal and print EXPLAIN plans and timings before and after migrating."""
+        scratch_dir = None
+        if not database_url:
+            scratch_dir = tempfile.mkdtemp()
+            database_url = f"sqlite:///{os.path.join(scratch_dir, 'explain.db')}"
+
+        engine = create_engine(database_url)
+        try:
+            db.metadata.create_all(engine)
+            started = time.perf_counter()
+            _seed_journal(engine, trades, users)
+            click.echo(f"Seeded {trades} trades in {time.perf_counter() - started:.1f}s ({engine.dialect.name})")
+
+            _print_plans(engine, "BEFORE")
+            upgrade(engine, versions={v for v, name, _ in list_migrations() if name == "hot_query_indexes"})
+            with engine.begin() as conn:
+                conn.exec_driver_sql("ANALYZE")
+            _print_plans(engine, "AFTER")
+        finally:
+            engine.dispose()
+            if scratch_dir:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    # ⏱ flask metrics-benchmark - per-trade Python loops vs the numpy metrics kernel
+    @app.cli.command("metrics-benchmark")
+    @click.option("--trades", default=100_000, show_default=True, help="Number of synthetic closed trades.")
+    @click.option("--repeat", default=3, show_default=True, help="Runs per implementation (best is reported).")
+    def metrics_benchmark(trades, repeat):
+        """Time equity curve, drawdown, streaks and period buckets both ways and check they agree."""
+        from app.routes.stats_helpers import date_array, equity_and_drawdown, longest_streaks, pnl_buckets
+
+        rng = np.random.default_rng(7)
+        exit_dates = sorted(date(2020, 1, 1) + timedelta(days=int(d)) for d in rng.integers(0, 5 * 365, trades))
+        pnl = np.round(rng.normal(50, 2_000, trades), 2).tolist()
+
+        def kernel():
+            days, values = date_array(exit_dates), np.asarray(pnl)
+            equity, max_drawdown = equity_and_drawdown(values)
+            buckets = {period: pnl_buckets(days, values, period) for period in ("day", "week", "month")}
+            return equity, max_drawdown, longest_streaks(values), buckets
+
+        results = {}
+        for label, func_ in (("python loops", lambda: _python_metrics(exit_dates, pnl)), ("numpy kernel", kernel)):
+            best = min(_timed(func_) for _ in range(repeat))
+            results[label] = func_()
+            click.echo(f"{label:<13} {trades} trades  {best * 1000:8.1f} ms")
+
+        (py_equity, py_dd, py_streaks, py_buckets), (np_equity, np_dd, np_streaks, np_buckets) = results.values()
+        agree = (np.allclose(py_equity, np_equity) and np.isclose(py_dd, np_dd) and py_streaks == np_streaks
+                 and all([d for d, _ in py_buckets[p]] == [d for d, _ in np_buckets[p]]
+                         and np.allclose([v for _, v in py_buckets[p]], [v for _, v in np_buckets[p]])
+                         for p in py_buckets))
+        if not agree:
+            click.echo("⚠️ Kernel differs from the per-trade loops")
+
+    # ⏱ flask pdf-benchmark - trade report build time, page-sized tables vs one big table
+    @app.cli.command("pdf-benchmark")
+    @click.option("--trades", "sizes", multiple=True, type=int, default=(1_000, 10_000, 50_000), show_default=True,
+                  help="Synthetic trade counts (repeatable).")
+    @click.option("--single-table-limit", default=10_000, show_default=True,
+                  help="Skip the one-big-table layout above this many trades (it grows quadratically).")
+    def pdf_benchmark(sizes, single_table_limit):
+        """Time build_trades_pdf for each journal size."""
+        from app.routes.export import PDF_TABLE_ROWS, build_trades_pdf, closed_trade_metrics
+        from app.routes.stats_helpers import TradeMetrics
+
+        rng = np.random.default_rng(7)
+        for size in sizes:
+            entry_dates = [date(2020, 1, 1) + timedelta(days=int(d)) for d in rng.integers(0, 5 * 365, size)]
+            trades = [TradeMetrics(f"STOCK{int(s)}", entry, entry + timedelta(days=int(hold)), "Closed", float(pnl), 10)
+                      for entry, s, hold, pnl in zip(entry_dates, rng.integers(0, 300, size),
+                                                      rng.integers(1, 60, size), rng.normal(50, 2_000, size))]
+            metrics = closed_trade_metrics(trades)
+
+            layouts = [("page tables", PDF_TABLE_ROWS)]
+            if size <= single_table_limit:
+                layouts.append(("one table", size))
+            for label, chunk_rows in layouts:
+                started = time.perf_counter()
+                pdf = build_trades_pdf(trades, metrics, "benchmark", chunk_rows)
+                elapsed = time.perf_counter() - started
+                click.echo(f"{label:<12} {size:>7} trades  {elapsed:7.2f} s  {len(pdf) / 1024:8.0f} KB")
+
+
+# Representative shapes of the dashboard / history / stats / calendar / notes queries
+HOT_QUERIES = {
+    "closed trades since date": "SELECT * FROM trades WHERE user_id = :user AND status = 'Closed' AND exit_date >= :since",
+    "open trades": "SELECT * FROM trades WHERE user_id = :user AND status = 'Open'",
+    "entries of one trade": "SELECT * FROM trade_entries WHERE trade_id = :trade",
+    "exits of one trade": "SELECT * FROM trade_exits WHERE trade_id = :trade",
+    "day notes newest first": "SELECT * FROM day_notes WHERE user_id = :user ORDER BY date DESC",
+    "stage2 history (30 days)": "SELECT * FROM stage2_stocks WHERE date >= :since ORDER BY date DESC",
+}
+
+
+def _seed_journal(engine, trade_count, user_count):
+    rng = random.Random(42)
+    today = date.today()
+    symbols = [f"STOCK{i}" for i in range(300)]
+    tables = db.metadata.tables
+
+    users = [{"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password_hash": "x"}
+             for i in range(1, user_count + 1)]
+    trades, entries, exits, notes, stage2 = [], [], [], [], []
+    for trade_id in range(1, trade_count + 1):
+        entry_date = today - timedelta(days=rng.randint(0, 1500))
+        closed = rng.random() < 0.7
+        exit_date = entry_date + timedelta(days=rng.randint(1, 60)) if closed else None
+        trades.append({"id": trade_id, "stock_name": rng.choice(symbols), "entry_date": entry_date,
+                       "exit_date": exit_date, "status": "Closed" if closed else "Open",
+                       "user_id": rng.randint(1, user_count)})
+        for _ in range(rng.randint(1, 3)):
+            quantity, price = rng.randint(1, 500), round(rng.uniform(50, 3000), 2)
+            entries.append({"trade_id": trade_id, "quantity": quantity, "price": price,
+                            "date": entry_date, "invested_amount": round(quantity * price, 2)})
+        if closed:
+            quantity, price = rng.randint(1, 500), round(rng.uniform(50, 3000), 2)
+            exits.append({"trade_id": trade_id, "quantity": quantity, "price": price,
+                          "date": exit_date, "exit_amount": round(quantity * price, 2)})
+    for i in range(trade_count // 10):
+        notes.append({"date": today - timedelta(days=rng.randint(0, 1500)), "summary": "note",
+                      "content": "...", "user_id": rng.randint(1, user_count)})
+    for day in range(60):
+        for symbol in rng.sample(symbols, 40):
+            stage2.append({"symbol": symbol, "date": today - timedelta(days=day), "price": 100.0})
+
+    with engine.begin() as conn:
+        for name, rows in (("users", users), ("trades", trades), ("trade_entries", entries),
+                           ("trade_exits", exits), ("day_notes", notes), ("stage2_stocks", stage2)):
+            for start in range(0, len(rows), 10_000):
+                conn.execute(tables[name].insert(), rows[start:start + 10_000])
+        conn.exec_driver_sql("ANALYZE")
+
+
+def _print_plans(engine, label, repeat=20):
+    params = {"user": 1, "trade": 50_000, "since": date.today() - timedelta(days=90)}
+    sqlite = engine.dialect.name == "sqlite"
+    click.echo(f"\n===== {label} =====")
+    with engine.connect() as conn:
+        for title, sql in HOT_QUERIES.items():
+            explain = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN ANALYZE "
+            plan = conn.execute(text(explain + sql), params).all()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(text(sql), params).all()
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+
+            click.echo(f"-- {title}  ({elapsed:.2f} ms)")
+            for row in plan:
+                click.echo(f"   {row[-1] if sqlite else row[0]}")
+
+
+def _timed(func_):
+    started = time.perf_counter()
+    func_()
+    return time.perf_counter() - started
+
+
+def _python_metrics(exit_dates, pnl):
+    """Per-trade reference loops for metrics-benchmark (what stats_helpers did before the kernel)."""
+    equity, peak, max_drawdown, curve = 0, 0, 0, []
+    for value in pnl:
+        equity += value
+        peak = max(peak, equity)
+        max_drawdown = max(max_drawdown, peak - equity)
+        curve.append(equity)
+
+    streaks = {True: 0, False: 0}
+    current, last = 0, None
+    for value in pnl:
+        won = value > 0
+        current = current + 1 if won == last else 1
+        last = won
+        streaks[won] = max(streaks[won], current)
+
+    buckets = {"day": {}, "week": {}, "month": {}}
+    for exit_date, value in zip(exit_dates, pnl):
+        for period, start in (("day", exit_date),
+                              ("week", exit_date - timedelta(days=exit_date.weekday())),
+                              ("month", exit_date.replace(day=1))):
+            buckets[period][start] = buckets[period].get(start, 0) + value
+    buckets = {period: sorted(totals.items()) for period, totals in buckets.items()}
+    return curve, max_drawdown, (streaks[True], streaks[False]), buckets
+
+
+def _trade_totals():
+    """{trade_id: aggregate columns} computed from trade_entries / trade_exits in two grouped queries."""
+    from app.models import Trade, TradeEntry, TradeExit
+
+    sums = {}
+    for model, qty_key, amount_key in ((TradeEntry, "buy_qty", "invested"), (TradeExit, "sell_qty", "exited")):
+        rows = db.session.query(
+            model.trade_id, func.sum(model.quantity), func.sum(model.quantity * model.price)
+        ).group_by(model.trade_id).all()
+        for trade_id, quantity, amount in rows:
+            sums.setdefault(trade_id, {})[qty_key] = int(quantity or 0)
+            sums[trade_id][amount_key] = float(amount or 0)
+
+    trade_ids = [trade_id for (trade_id,) in db.session.query(Trade.id)]
+    return {
+        trade_id: Trade.compute_totals(s.get("buy_qty", 0), s.get("invested", 0.0),
+                                       s.get("sell_qty", 0), s.get("exited", 0.0))
+        for trade_id, s in ((trade_id, sums.get(trade_id, {})) for trade_id in trade_ids)
+    }
@@ -0,0 +1,69 @@
+from sqlalchemy import case, func
+from app.extensions import db
+from app.models import Trade, UserDailyPnl
+
+# 📅 Per-user daily realized P&L rollup (user_daily_pnl)
+#
+# One row per user per exit date, summed over that day's closed trades. The
+# trade routes call refresh_daily_pnl() with the exit dates a write touched
+# (old and new), so the stats charts, equity curve and calendar read a few
+# hundred day rows instead of the whole trade history.
+
+
+def _daily_rows(*criteria):
+    pnl = Trade.exited_amount - Trade.invested_amount
+    rows = db.session.query(
+        Trade.user_id,
+        Trade.exit_date,
+        func.sum(pnl),
+        func.count(Trade.id),
+        func.sum(case((pnl > 0, 1), else_=0)),
+        func.sum(case((pnl > 0, pnl), else_=0)),
+        func.sum(case((pnl < 0, pnl), else_=0)),
+    ).filter(Trade.status == "Closed", Trade.exit_date.isnot(None), *criteria) \
+        .group_by(Trade.user_id, Trade.exit_date).all()
+
+    return [
+        dict(user_id=user_id, exit_date=exit_date, realized_pnl=float(realized), trade_count=count,
+             win_count=int(wins), gross_profit=float(profit), gross_loss=float(loss))
+        for user_id, exit_date, realized, count, wins, profit, loss in rows
+    ]
+
+
+# 🔄 Recompute one user's rows for the given exit dates (same transaction as the trade write)
+def refresh_daily_pnl(user_id, days):
+    days = {d for d in days if d}
+    if not days:
+        return
+    db.session.flush()
+    rows = _daily_rows(Trade.user_id == user_id, Trade.exit_date.in_(days))
+    UserDailyPnl.query.filter(
+        UserDailyPnl.user_id == user_id, UserDailyPnl.exit_date.in_(days)
+    ).delete(synchronize_session=False)
+    db.session.add_all(UserDailyPnl(**row) for row in rows)
+
+
+# 🔧 Regenerate the rollup from the trades table (all users, or one)
+def rebuild_daily_pnl(user_id=None):
+    criteria = [Trade.user_id == user_id] if user_id is not None else []
+    query = UserDailyPnl.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    query.delete(synchronize_session=False)
+
+    rows = _daily_rows(*criteria)
+    db.session.add_all(UserDailyPnl(**row) for row in rows)
+    db.session.commit()
+    return len(rows)
+
+
+# 📖 (exit_date, realized_pnl, gross_profit, gross_loss) for one user, oldest first
+def get_daily_pnl(user_id, start_date=None, end_date=None):
+    query = db.session.query(
+        UserDailyPnl.exit_date, UserDailyPnl.realized_pnl, UserDailyPnl.gross_profit, UserDailyPnl.gross_loss
+    ).filter(UserDailyPnl.user_id == user_id)
+    if start_date:
+        query = query.filter(UserDailyPnl.exit_date >= start_date)
+    if end_date:
+        query = query.filter(UserDailyPnl.exit_date <= end_date)
+    return query.order_by(UserDailyPnl.exit_date).all()
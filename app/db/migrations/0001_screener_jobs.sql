@@ -0,0 +1,16 @@
+-- Background screener runs (app/jobs.py)
+CREATE TABLE IF NOT EXISTS screener_jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    progress INT DEFAULT 0,
+    processed INT DEFAULT 0,
+    total INT DEFAULT 0,
+    errors TEXT,
+    result TEXT,
+    result_endpoint VARCHAR(100),
+    user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
@@ -0,0 +1,8 @@
+-- One row per (symbol, date) in the screener history tables; keep the newest duplicate
+DELETE FROM stage2_stocks WHERE id NOT IN (SELECT MAX(id) FROM stage2_stocks GROUP BY symbol, date);
+DELETE FROM delivery_surge_stock WHERE id NOT IN (SELECT MAX(id) FROM delivery_surge_stock GROUP BY symbol, date);
+DELETE FROM stage2_delivery_stock WHERE id NOT IN (SELECT MAX(id) FROM stage2_delivery_stock GROUP BY symbol, date);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_stage2_stocks_symbol_date ON stage2_stocks (symbol, date);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_delivery_surge_stock_symbol_date ON delivery_surge_stock (symbol, date);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_stage2_delivery_stock_symbol_date ON stage2_delivery_stock (symbol, date);
@@ -0,0 +1,46 @@
+-- Days present / streak per screener symbol, backfilled from the history tables
+CREATE TABLE IF NOT EXISTS screener_persistence (
+    screener VARCHAR(30) NOT NULL,
+    symbol VARCHAR(20) NOT NULL,
+    days_present INT NOT NULL DEFAULT 0,
+    current_streak INT NOT NULL DEFAULT 0,
+    first_seen DATE,
+    last_seen DATE,
+    PRIMARY KEY (screener, symbol)
+);
+
+-- stage2: streak = leading run of the newest screener dates that include the symbol
+INSERT INTO screener_persistence (screener, symbol, days_present, current_streak, first_seen, last_seen)
+SELECT 'stage2', symbol, COUNT(*), SUM(CASE WHEN run = pos THEN 1 ELSE 0 END), MIN(date), MAX(date)
+FROM (
+    SELECT h.symbol, h.date, r.run, ROW_NUMBER() OVER (PARTITION BY h.symbol ORDER BY r.run) AS pos
+    FROM stage2_stocks h
+    JOIN (SELECT date, ROW_NUMBER() OVER (ORDER BY date DESC) AS run
+          FROM (SELECT DISTINCT date FROM stage2_stocks) d) r ON r.date = h.date
+) hits
+GROUP BY symbol
+ON CONFLICT (screener, symbol) DO NOTHING;
+
+-- delivery_surge: streak = leading run of the newest screener dates that include the symbol
+INSERT INTO screener_persistence (screener, symbol, days_present, current_streak, first_seen, last_seen)
+SELECT 'delivery_surge', symbol, COUNT(*), SUM(CASE WHEN run = pos THEN 1 ELSE 0 END), MIN(date), MAX(date)
+FROM (
+    SELECT h.symbol, h.date, r.run, ROW_NUMBER() OVER (PARTITION BY h.symbol ORDER BY r.run) AS pos
+    FROM delivery_surge_stock h
+    JOIN (SELECT date, ROW_NUMBER() OVER (ORDER BY date DESC) AS run
+          FROM (SELECT DISTINCT date FROM delivery_surge_stock) d) r ON r.date = h.date
+) hits
+GROUP BY symbol
+ON CONFLICT (screener, symbol) DO NOTHING;
+
+-- stage2_delivery: streak = leading run of the newest screener dates that include the symbol
+INSERT INTO screener_persistence (screener, symbol, days_present, current_streak, first_seen, last_seen)
+SELECT 'stage2_delivery', symbol, COUNT(*), SUM(CASE WHEN run = pos THEN 1 ELSE 0 END), MIN(date), MAX(date)
+FROM (
+    SELECT h.symbol, h.date, r.run, ROW_NUMBER() OVER (PARTITION BY h.symbol ORDER BY r.run) AS pos
+    FROM stage2_delivery_stock h
+    JOIN (SELECT date, ROW_NUMBER() OVER (ORDER BY date DESC) AS run
+          FROM (SELECT DISTINCT date FROM stage2_delivery_stock) d) r ON r.date = h.date
+) hits
+GROUP BY symbol
+ON CONFLICT (screener, symbol) DO NOTHING;
@@ -0,0 +1,23 @@
+-- Composite indexes for the journal's hot query shapes
+
+-- Dashboard / history / stats / P&L summary: user's trades by status and exit date
+CREATE INDEX IF NOT EXISTS ix_trades_user_status_exit_date ON trades (user_id, status, exit_date);
+
+-- Relationship loads of a trade's entries and exits
+CREATE INDEX IF NOT EXISTS ix_trade_entries_trade_id ON trade_entries (trade_id);
+CREATE INDEX IF NOT EXISTS ix_trade_exits_trade_id ON trade_exits (trade_id);
+
+-- Notes list (user's notes, newest first)
+CREATE INDEX IF NOT EXISTS ix_day_notes_user_date ON day_notes (user_id, date);
+
+-- Watchlist and pinned resources per user
+CREATE INDEX IF NOT EXISTS ix_watchlist_user_date_added ON watchlist (user_id, date_added);
+CREATE INDEX IF NOT EXISTS ix_resources_user_pinned ON resources (user_id, pinned);
+
+-- Screener history pages scan the last 30 days; (symbol, date) is covered by the unique keys
+CREATE INDEX IF NOT EXISTS ix_stage2_stocks_date ON stage2_stocks (date);
+CREATE INDEX IF NOT EXISTS ix_delivery_surge_stock_date ON delivery_surge_stock (date);
+CREATE INDEX IF NOT EXISTS ix_stage2_delivery_stock_date ON stage2_delivery_stock (date);
+
+-- Job cleanup (delete_old_jobs)
+CREATE INDEX IF NOT EXISTS ix_screener_jobs_created_at ON screener_jobs (created_at);
@@ -0,0 +1,18 @@
+-- Per-trade aggregates of entries/exits (maintained by Trade.refresh_totals)
+ALTER TABLE trades ADD COLUMN IF NOT EXISTS total_buy_qty INT NOT NULL DEFAULT 0;
+ALTER TABLE trades ADD COLUMN IF NOT EXISTS total_sell_qty INT NOT NULL DEFAULT 0;
+ALTER TABLE trades ADD COLUMN IF NOT EXISTS invested_amount DOUBLE PRECISION NOT NULL DEFAULT 0;
+ALTER TABLE trades ADD COLUMN IF NOT EXISTS exited_amount DOUBLE PRECISION NOT NULL DEFAULT 0;
+ALTER TABLE trades ADD COLUMN IF NOT EXISTS avg_entry_price DOUBLE PRECISION NOT NULL DEFAULT 0;
+ALTER TABLE trades ADD COLUMN IF NOT EXISTS realized_pnl DOUBLE PRECISION NOT NULL DEFAULT 0;
+
+-- Backfill (same formulas as Trade.compute_totals; `flask verify-trade-aggregates` checks them)
+UPDATE trades SET
+    total_buy_qty = COALESCE((SELECT SUM(quantity) FROM trade_entries e WHERE e.trade_id = trades.id), 0),
+    invested_amount = COALESCE((SELECT SUM(quantity * price) FROM trade_entries e WHERE e.trade_id = trades.id), 0),
+    total_sell_qty = COALESCE((SELECT SUM(quantity) FROM trade_exits x WHERE x.trade_id = trades.id), 0),
+    exited_amount = COALESCE((SELECT SUM(quantity * price) FROM trade_exits x WHERE x.trade_id = trades.id), 0);
+
+UPDATE trades SET
+    avg_entry_price = CASE WHEN total_buy_qty > 0 THEN invested_amount / total_buy_qty ELSE 0 END,
+    realized_pnl = CASE WHEN total_buy_qty > 0 THEN exited_amount - (invested_amount / total_buy_qty) * total_sell_qty ELSE 0 END;
@@ -0,0 +1,24 @@
+-- Daily realized P&L rollup per user (maintained by app/daily_pnl.py)
+CREATE TABLE IF NOT EXISTS user_daily_pnl (
+    user_id INTEGER NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    exit_date DATE NOT NULL,
+    realized_pnl DOUBLE PRECISION NOT NULL DEFAULT 0,
+    trade_count INT NOT NULL DEFAULT 0,
+    win_count INT NOT NULL DEFAULT 0,
+    gross_profit DOUBLE PRECISION NOT NULL DEFAULT 0,
+    gross_loss DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, exit_date)
+);
+
+-- Backfill from closed trades (same grouping as `flask rebuild-daily-pnl`)
+INSERT INTO user_daily_pnl (user_id, exit_date, realized_pnl, trade_count, win_count, gross_profit, gross_loss)
+SELECT user_id, exit_date,
+       SUM(exited_amount - invested_amount),
+       COUNT(*),
+       SUM(CASE WHEN exited_amount - invested_amount > 0 THEN 1 ELSE 0 END),
+       SUM(CASE WHEN exited_amount - invested_amount > 0 THEN exited_amount - invested_amount ELSE 0 END),
+       SUM(CASE WHEN exited_amount - invested_amount < 0 THEN exited_amount - invested_amount ELSE 0 END)
+FROM trades
+WHERE status = 'Closed' AND exit_date IS NOT NULL
+GROUP BY user_id, exit_date
+ON CONFLICT (user_id, exit_date) DO NOTHING;
@@ -0,0 +1,2 @@
+-- Trade history pages: closed trades ordered by realized P&L, keyset-continued on (pnl, id)
+CREATE INDEX IF NOT EXISTS ix_trades_user_status_pnl ON trades (user_id, status, (exited_amount - invested_amount), id);
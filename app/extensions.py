@@ -3,10 +3,12 @@ from flask_login import LoginManager
 from flask_wtf import CSRFProtect
 from flask_caching import Cache
 from flask_mail import Mail
+from prometheus_flask_exporter import PrometheusMetrics
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 csrf = CSRFProtect()
-cache = Cache(config={'CACHE_TYPE': 'SimpleCache'})
+cache = Cache()  # backend comes from Config (CACHE_TYPE)
 mail = Mail()
+metrics = PrometheusMetrics.for_app_factory(path='/metrics', default=True)
 
@@ -0,0 +1,164 @@
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import numpy as np
+from flask import current_app, flash, has_request_context
+from flask_login import current_user
+from app.extensions import db
+from app.models import ScreenerJob
+
+# ⚙️ Background job runner for long screener runs
+#
+# POST handlers call submit_job() and return straight away; the work runs on a
+# small thread pool inside an app context. Job functions report progress and
+# errors through report_progress() / job_flash(), which are no-ops (or plain
+# flashes) when the same code runs inside a request.
+
+_executor = None
+_executor_lock = threading.Lock()
+_current = threading.local()
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get("JOB_WORKERS", 2),
+                                           thread_name_prefix="screener-job")
+        return _executor
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# 🚀 Queue a job and return its row immediately
+def submit_job(kind, func, result_endpoint, *args):
+    app = current_app._get_current_object()
+    delete_old_jobs()
+
+    job = ScreenerJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        status="queued",
+        result_endpoint=result_endpoint,
+        user_id=current_user.id if current_user.is_authenticated else None,
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    _get_executor(app).submit(_run_job, app, job.id, func, args)
+    return job
+
+
+def _run_job(app, job_id, func, args):
+    with app.app_context():
+        # Status changes are conditional: a job fail_stale_jobs() gave up on stays failed
+        if not _move_job(job_id, "queued", status="running", started_at=datetime.utcnow()):
+            db.session.remove()
+            return
+        _current.job_id = job_id
+        _current.last_percent = -1
+        _current.messages = []
+
+        try:
+            result = func(*args)
+            outcome = {"result": json.dumps(result, default=_json_default), "status": "finished", "progress": 100}
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception(f"Job {job_id} ({func.__name__}) failed")
+            _current.messages.append(["error", f"⚠️ Job failed: {e}"])
+            outcome = {"status": "failed"}
+
+        outcome["errors"] = json.dumps(_current.messages) if _current.messages else None
+        outcome["finished_at"] = datetime.utcnow()
+        if not _move_job(job_id, "running", **outcome):
+            current_app.logger.warning(f"Job {job_id} ({func.__name__}) ended after it was marked failed")
+        _current.job_id = None
+        db.session.remove()
+
+
+def _move_job(job_id, from_status, **values):
+    """Update the job only while it is still in from_status; True when it was."""
+    count = ScreenerJob.query.filter_by(id=job_id, status=from_status).update(values, synchronize_session=False)
+    db.session.commit()
+    return bool(count)
+
+
+# 📈 Progress from inside a job function (ignored outside jobs)
+def report_progress(processed, total):
+    job_id = getattr(_current, "job_id", None)
+    if not job_id or not total:
+        return
+    percent = int(processed * 100 / total)
+    if percent == _current.last_percent and processed != total:
+        return  # one write per percent is plenty for the status page
+    _current.last_percent = percent
+    db.session.query(ScreenerJob).filter_by(id=job_id).update(
+        {"processed": processed, "total": total, "progress": percent}
+    )
+    db.session.commit()
+
+
+# ⚠️ flash() inside a request, recorded on the job when running in the background
+def job_flash(message, category="error"):
+    if getattr(_current, "job_id", None):
+        _current.messages.append([category, message])
+    elif has_request_context():
+        flash(message, category)
+    else:
+        print(message)
+
+
+# 🔒 Jobs started by a logged-in user belong to that user; anonymous runs are shared
+def can_view_job(job):
+    return job.user_id is None or (current_user.is_authenticated and job.user_id == current_user.id)
+
+
+# 📦 Stored template context of a finished job of this kind (messages are re-flashed once rendered)
+def job_result(job_id, kind):
+    job = db.session.get(ScreenerJob, job_id) if job_id else None
+    if not job or job.kind != kind or not can_view_job(job) or job.status != "finished" or not job.result:
+        return None
+    for category, message in json.loads(job.errors or "[]"):
+        flash(message, category)
+    return json.loads(job.result)
+
+
+# 🧟 Jobs a crash or restart left queued/running would spin forever -> failed
+def fail_stale_jobs(timeout, job_id=None):
+    """Fail queued/running jobs started (or queued) more than timeout seconds ago; returns the count."""
+    now = datetime.utcnow()
+    query = ScreenerJob.query.filter(
+        ScreenerJob.status.in_(("queued", "running")),
+        db.func.coalesce(ScreenerJob.started_at, ScreenerJob.created_at) < now - timedelta(seconds=timeout),
+    )
+    if job_id:
+        query = query.filter(ScreenerJob.id == job_id)
+    count = query.update({
+        "status": "failed",
+        "errors": json.dumps([["error", "⚠️ Job stopped responding (server restart or crash). Please run it again."]]),
+        "finished_at": now,
+    }, synchronize_session=False)
+    db.session.commit()
+    if count:
+        current_app.logger.warning(f"Marked {count} stale job(s) as failed")
+    return count
+
+
+# 🧹 Keep the jobs table small
+def delete_old_jobs(days=7):
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    ScreenerJob.query.filter(ScreenerJob.created_at < cutoff).delete()
+    db.session.commit()
@@ -0,0 +1,89 @@
+import threading
+from datetime import date
+import pandas as pd
+import yfinance as yf
+from curl_cffi import requests as curl_requests
+from app.bar_store import get_weekly_bars
+from app.jobs import report_progress
+
+
+# 🔢 HTTP session that counts the requests (and bytes) yfinance moves through it
+class CountingSession(curl_requests.Session):
+    def __init__(self, **kwargs):
+        kwargs.setdefault("impersonate", "chrome")
+        super().__init__(**kwargs)
+        self.request_count = 0
+        self.bytes_received = 0
+        self._count_lock = threading.Lock()
+
+    def request(self, *args, **kwargs):
+        response = super().request(*args, **kwargs)
+        with self._count_lock:
+            self.request_count += 1
+            self.bytes_received += len(response.content or b"")
+        return response
+
+# 📦 Benchmark cache - one download per (symbol, weeks) per trading day
+_benchmark_cache = {}
+_benchmark_lock = threading.Lock()
+
+def get_benchmark_weekly(symbol="^NSEI", weeks=60):
+    """
+    Weekly history for a benchmark index, fetched at most once per day per process.
+    The returned DataFrame is shared between callers - treat it as read-only.
+    """
+    key = (symbol, weeks, date.today())
+    with _benchmark_lock:
+        if key in _benchmark_cache:
+            return _benchmark_cache[key]
+
+        df = get_weekly_bars(symbol, weeks)
+        if df.empty:
+            return df  # don't cache failed downloads, retry next call
+
+        # Drop entries from previous days so the cache never grows
+        for stale in [k for k in _benchmark_cache if k[2] != key[2]]:
+            del _benchmark_cache[stale]
+        _benchmark_cache[key] = df
+        return df
+
+# 📦 Batched multi-ticker download -> wide (date x symbol) Close/Volume panels
+def download_panel(symbols, period="60wk", interval="1wk", chunk_size=100, session=None):
+    closes, volumes = [], []
+    for start in range(0, len(symbols), chunk_size):
+        chunk = symbols[start:start + chunk_size]
+        try:
+            data = yf.download(chunk, period=period, interval=interval, group_by="column",
+                               auto_adjust=True, progress=False, threads=True, session=session)
+        except Exception as e:
+            print(f"Error downloading chunk starting at {chunk[0]}: {e}")
+            continue
+        if data.empty:
+            continue
+        closes.append(data["Close"])
+        volumes.append(data["Volume"])
+        report_progress(min(start + chunk_size, len(symbols)), len(symbols))
+
+    if not closes:
+        return pd.DataFrame(), pd.DataFrame()
+    close = pd.concat(closes, axis=1).sort_index()
+    volume = pd.concat(volumes, axis=1).sort_index()
+    return close, volume
+
+# 📦 Same Close/Volume panels, assembled from the local bar store
+def load_weekly_panel(symbols, weeks=60, session=None):
+    closes, volumes = {}, {}
+    for i, symbol in enumerate(symbols, start=1):
+        try:
+            weekly = get_weekly_bars(symbol, weeks, session=session)
+        except Exception as e:
+            print(f"Error loading bars for {symbol}: {e}")
+            weekly = None
+        if weekly is not None and not weekly.empty:
+            closes[symbol] = weekly["Close"]
+            volumes[symbol] = weekly["Volume"]
+        report_progress(i, len(symbols))
+
+    if not closes:
+        return pd.DataFrame(), pd.DataFrame()
+    return pd.concat(closes, axis=1).sort_index(), pd.concat(volumes, axis=1).sort_index()
@@ -0,0 +1,72 @@
+import os
+import re
+from sqlalchemy import text
+
+# 🗂 Versioned SQL migrations (app/db/migrations/NNNN_name.sql)
+#
+# schema.sql stays the full snapshot for new databases; migrations bring
+# existing ones up to date. Each file runs in one transaction together with
+# its row in schema_migrations, and every statement is written to be
+# idempotent (PostgreSQL syntax), so running them against a database built
+# from schema.sql is a harmless no-op that just records the versions.
+# `flask db-upgrade` refuses other databases; only the index migration is
+# portable, which is all explain-hot-queries applies to its SQLite scratch db.
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "db", "migrations")
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def list_migrations():
+    """[(version, name, path)] sorted by version."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r"^(\d{4})_(\w+)\.sql$", filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(found)
+
+
+def _statements(path):
+    with open(path) as f:
+        sql = "\n".join(line for line in f if not line.lstrip().startswith("--"))
+    return [s.strip() for s in sql.split(";") if s.strip()]
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        conn.execute(text(_CREATE_TABLE))
+        return {row.version: row for row in conn.execute(text(
+            "SELECT version, name, applied_at FROM schema_migrations"
+        ))}
+
+
+# ⬆️ Apply pending migrations in order (up to `target`). Returns the applied versions.
+def upgrade(engine, target=None, versions=None):
+    done = applied_versions(engine)
+    applied = []
+    for version, name, path in list_migrations():
+        if version in done or (target is not None and version > target):
+            continue
+        if versions is not None and version not in versions:
+            continue
+        with engine.begin() as conn:
+            for statement in _statements(path):
+                conn.exec_driver_sql(statement)
+            conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                         {"v": version, "n": name})
+        applied.append(version)
+    return applied
+
+
+def status(engine):
+    """[(version, name, applied_at or None)] for every migration file."""
+    done = applied_versions(engine)
+    return [(version, name, done[version].applied_at if version in done else None)
+            for version, name, _ in list_migrations()]
@@ -51,32 +51,54 @@ class Trade(db.Model):
     status = db.Column(db.String(10), nullable=False, default="Open")
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     strategy_tag = db.Column(db.String(50), nullable=True)   # ✅ New column for strategy tag
+    # Aggregates of entries/exits, kept current by refresh_totals() on every entry/exit write
+    total_buy_qty = db.Column(db.Integer, nullable=False, default=0)
+    total_sell_qty = db.Column(db.Integer, nullable=False, default=0)
+    invested_amount = db.Column(db.Float, nullable=False, default=0)   # sum(quantity * price) of entries
+    exited_amount = db.Column(db.Float, nullable=False, default=0)     # sum(quantity * price) of exits
+    avg_entry_price = db.Column(db.Float, nullable=False, default=0)
+    realized_pnl = db.Column(db.Float, nullable=False, default=0)      # exits vs average entry price
     entries = db.relationship('TradeEntry', backref='trade', lazy=True)
     exits = db.relationship('TradeExit', backref='trade', lazy=True)
+
+    @staticmethod
+    def compute_totals(buy_qty, invested, sell_qty, exited):
+        """Aggregate column values from the raw entry/exit sums."""
+        avg_entry_price = invested / buy_qty if buy_qty else 0
+        return {
+            'total_buy_qty': buy_qty,
+            'total_sell_qty': sell_qty,
+            'invested_amount': invested,
+            'exited_amount': exited,
+            'avg_entry_price': avg_entry_price,
+            'realized_pnl': exited - avg_entry_price * sell_qty if buy_qty else 0,
+        }
+
+    def refresh_totals(self):
+        """Recompute the aggregates from the database rows (same transaction as the entry/exit write)."""
+        db.session.flush()
+        buy_qty, invested = db.session.query(
+            db.func.coalesce(db.func.sum(TradeEntry.quantity), 0),
+            db.func.coalesce(db.func.sum(TradeEntry.quantity * TradeEntry.price), 0),
+        ).filter(TradeEntry.trade_id == self.id).one()
+        sell_qty, exited = db.session.query(
+            db.func.coalesce(db.func.sum(TradeExit.quantity), 0),
+            db.func.coalesce(db.func.sum(TradeExit.quantity * TradeExit.price), 0),
+        ).filter(TradeExit.trade_id == self.id).one()
+
+        totals = self.compute_totals(int(buy_qty), float(invested), int(sell_qty), float(exited))
+        for column, value in totals.items():
+            setattr(self, column, value)
+
     @property
     def pnl(self):
         if self.status.lower() != 'closed':
             return 0
+        return round(self.exited_amount - self.invested_amount, 2)
 
-        total_entry = sum(e.price * e.quantity for e in self.entries if e.price and e.quantity)
-        total_exit = sum(x.price * x.quantity for x in self.exits if x.price and x.quantity)
-
-        return round(total_exit - total_entry, 2)
     @property
     def realized_profit(self):
-        if not self.exits or not self.entries:
-            return 0
-
-        total_entry = sum(e.price * e.quantity for e in self.entries if e.price and e.quantity)
-        total_quantity = sum(e.quantity for e in self.entries if e.quantity)
-
-        if total_quantity == 0:
-            return 0
-
-        avg_entry_price = total_entry / total_quantity
-
-        profit = sum((x.price - avg_entry_price) * x.quantity for x in self.exits if x.price and x.quantity)
-        return round(profit, 2)
+        return round(self.realized_pnl, 2)
 
 
 class TradeEntry(db.Model):
@@ -149,6 +171,7 @@ class Watchlist(db.Model):
 # Stage2Stock models.py
 class Stage2Stock(db.Model):
     __tablename__ = 'stage2_stocks'
+    __table_args__ = (db.UniqueConstraint('symbol', 'date', name='uq_stage2_stocks_symbol_date'),)
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(20), nullable=False)
     price = db.Column(db.Float)
@@ -156,7 +179,7 @@ class Stage2Stock(db.Model):
     volume = db.Column(db.BigInteger)
     vol_avg = db.Column(db.BigInteger)
     rs = db.Column(db.Float)
-    date = db.Column(db.DateTime, nullable=False)
+    date = db.Column(db.Date, nullable=False)
 
 # models Momentum
 
@@ -182,6 +205,7 @@ class MomentumTrade(db.Model):
 
 # models Delivery Surge Stock
 class DeliverySurgeStock(db.Model):
+    __table_args__ = (db.UniqueConstraint('symbol', 'date', name='uq_delivery_surge_stock_symbol_date'),)
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(20), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -196,6 +220,7 @@ class DeliverySurgeStock(db.Model):
 
 #Stage2DeliveryStock modal
 class Stage2DeliveryStock(db.Model):
+    __table_args__ = (db.UniqueConstraint('symbol', 'date', name='uq_stage2_delivery_stock_symbol_date'),)
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(20), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -226,4 +251,56 @@ class EPSScreenerResult(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     def __repr__(self):
-        return f"<EPSScreenerResult {self.symbol_clean} @ {self.screener_date}>"
\ No newline at end of file
+        return f"<EPSScreenerResult {self.symbol_clean} @ {self.screener_date}>"
+
+
+# Background screener jobs
+class ScreenerJob(db.Model):
+    __tablename__ = 'screener_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, finished, failed
+    progress = db.Column(db.Integer, default=0)  # percent
+    processed = db.Column(db.Integer, default=0)  # symbols processed
+    total = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text)  # JSON list of messages
+    result = db.Column(db.Text)  # JSON template context
+    result_endpoint = db.Column(db.String(100))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ScreenerJob {self.kind} {self.id} {self.status}>"
+
+
+# Screener persistence (days present / streak per symbol, kept up to date by the save steps)
+class ScreenerPersistence(db.Model):
+    __tablename__ = 'screener_persistence'
+
+    screener = db.Column(db.String(30), primary_key=True)  # stage2, delivery_surge, stage2_delivery
+    symbol = db.Column(db.String(20), primary_key=True)
+    days_present = db.Column(db.Integer, nullable=False, default=0)  # rows in the 30-day history
+    current_streak = db.Column(db.Integer, nullable=False, default=0)  # consecutive screener runs
+    first_seen = db.Column(db.Date)
+    last_seen = db.Column(db.Date)
+
+    def __repr__(self):
+        return f"<ScreenerPersistence {self.screener} {self.symbol} {self.days_present}d>"
+
+
+class UserDailyPnl(db.Model):
+    __tablename__ = 'user_daily_pnl'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    exit_date = db.Column(db.Date, primary_key=True)
+    realized_pnl = db.Column(db.Float, nullable=False, default=0)  # sum of closed-trade P&L that day
+    trade_count = db.Column(db.Integer, nullable=False, default=0)
+    win_count = db.Column(db.Integer, nullable=False, default=0)
+    gross_profit = db.Column(db.Float, nullable=False, default=0)  # sum of winning trades
+    gross_loss = db.Column(db.Float, nullable=False, default=0)    # sum of losing trades (<= 0)
+
+    def __repr__(self):
+        return f"<UserDailyPnl {self.user_id} {self.exit_date} {self.realized_pnl}>"
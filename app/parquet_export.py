@@ -0,0 +1,116 @@
+import tempfile
+import zipfile
+from sqlalchemy import Float, select, type_coerce
+from app.extensions import db
+from app.models import Trade, TradeEntry, TradeExit
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only the Parquet export needs it (pip install pyarrow)
+    pa = pq = None
+
+# 🗂 Columnar export of the journal (trades, trade_entries, trade_exits)
+#
+# Rows come off a yield_per cursor in partitions, are transposed straight into
+# Arrow arrays and written as Parquet record batches - no per-row dicts. Money is
+# decimal(.., 2), dates are date32 and repeated labels are dictionary-encoded,
+# so pandas.read_parquet gets typed (category / date) columns without parsing.
+
+BATCH_ROWS = 50_000
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+PARQUET_TABLES = ("trades", "trade_entries", "trade_exits")
+DELTA_COLUMNS = ("id", "trade_id")  # sorted keys - delta-packed to almost nothing
+
+
+def parquet_available():
+    return pa is not None
+
+
+def _money(column):
+    # Numeric columns come back as Decimal (and price as float) - read everything as float, cast once in Arrow
+    return type_coerce(column, Float)
+
+
+def _table_columns(name):
+    """[(label, SQL column, Arrow type)] of one exported table."""
+    category = pa.dictionary(pa.int32(), pa.string())
+    money = pa.decimal128(14, 2)
+    if name == "trades":
+        return [
+            ("id", Trade.id, pa.int64()),
+            ("stock_name", Trade.stock_name, category),
+            ("strategy_tag", Trade.strategy_tag, category),
+            ("status", Trade.status, category),
+            ("entry_date", Trade.entry_date, pa.date32()),
+            ("exit_date", Trade.exit_date, pa.date32()),
+            ("created_at", Trade.created_at, pa.timestamp("us")),
+            ("total_buy_qty", Trade.total_buy_qty, pa.int64()),
+            ("total_sell_qty", Trade.total_sell_qty, pa.int64()),
+            ("invested_amount", _money(Trade.invested_amount), money),
+            ("exited_amount", _money(Trade.exited_amount), money),
+            ("avg_entry_price", Trade.avg_entry_price, pa.float64()),
+            ("realized_pnl", Trade.realized_pnl, pa.float64()),
+            ("entry_note", Trade.entry_note, pa.string()),
+            ("journal", Trade.journal, pa.string()),
+        ]
+    model, amount = (TradeEntry, "invested_amount") if name == "trade_entries" else (TradeExit, "exit_amount")
+    return [
+        ("id", model.id, pa.int64()),
+        ("trade_id", model.trade_id, pa.int64()),
+        ("date", model.date, pa.date32()),
+        ("quantity", model.quantity, pa.int64()),
+        ("price", _money(model.price), money),
+        (amount, _money(getattr(model, amount)), money),
+        ("note", model.note, pa.string()),
+    ]
+
+
+def _statement(name, trade_ids, columns):
+    stmt = select(*[column for _, column, _ in columns])
+    if name == "trades":
+        return stmt.where(Trade.id.in_(trade_ids)).order_by(Trade.id)
+    model = TradeEntry if name == "trade_entries" else TradeExit
+    return stmt.where(model.trade_id.in_(trade_ids)).order_by(model.trade_id, model.id)
+
+
+def _record_batch(rows, schema):
+    arrays = []
+    for values, field in zip(zip(*rows), schema):
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        elif pa.types.is_decimal(field.type):
+            arrays.append(pa.array(values, pa.float64()).cast(field.type))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(sink, name, trade_ids):
+    """Write one table to sink in record batches. trade_ids: select of the exported trade ids."""
+    columns = _table_columns(name)
+    schema = pa.schema([(label, arrow_type) for label, _, arrow_type in columns])
+    delta = [label for label in schema.names if label in DELTA_COLUMNS]
+    writer = pq.ParquetWriter(sink, schema, compression="zstd",
+                              use_dictionary=[label for label in schema.names if label not in delta],
+                              column_encoding=dict.fromkeys(delta, "DELTA_BINARY_PACKED"))
+    try:
+        result = db.session.execute(_statement(name, trade_ids, columns).execution_options(yield_per=BATCH_ROWS))
+        for rows in result.partitions():
+            writer.write_batch(_record_batch(rows, schema))
+    finally:
+        writer.close()
+
+
+# 📦 One table as .parquet, or all three in a zip -> spooled temp file positioned at 0
+def build_parquet_export(trade_ids, table=None):
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    if table:
+        write_parquet(output, table, trade_ids)
+    else:
+        with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:  # Parquet is compressed already
+            for name in PARQUET_TABLES:
+                with archive.open(f"{name}.parquet", "w") as member:
+                    write_parquet(member, name, trade_ids)
+    output.seek(0)
+    return output
@@ -0,0 +1,125 @@
+from collections import Counter
+from datetime import date, timedelta
+from sqlalchemy import delete, func, update
+from app.extensions import cache, db
+from app.models import ScreenerPersistence, Stage2Stock, DeliverySurgeStock, Stage2DeliveryStock
+from app.upsert import upsert_rows
+
+# 🔁 Screener persistence - days present / current streak per (screener, symbol)
+#
+# Maintained by the save step of each screener (record_screener_run) and by the
+# purge of old history rows (purge_screener_rows), so history pages read the
+# tags with one primary-key lookup instead of a GROUP BY over 30 days of rows.
+# Reads purge first when no purge has run today, so the counts always cover a
+# rolling 30 days even while a screener is not being run.
+
+RETENTION_DAYS = 30
+PURGE_MARKER = "screener_purged:{}"  # cache key -> date of the screener's last purge
+
+SCREENER_MODELS = {
+    "stage2": Stage2Stock,
+    "delivery_surge": DeliverySurgeStock,
+    "stage2_delivery": Stage2DeliveryStock,
+}
+
+
+def persistence_tag(days):
+    return (
+        "🔥 30D" if days >= 30 else
+        "📆 15D" if days >= 15 else
+        "🕒 7D" if days >= 7 else
+        "⏳ 3D" if days >= 3 else ""
+    )
+
+
+# 📖 {symbol: ScreenerPersistence} for one screener, days outside the window dropped first
+def get_persistence(screener, symbols=None):
+    if cache.get(PURGE_MARKER.format(screener)) != date.today().isoformat():
+        purge_screener_rows(screener)
+    return _persistence_rows(screener, symbols)
+
+
+def _persistence_rows(screener, symbols=None):
+    query = ScreenerPersistence.query.filter_by(screener=screener)
+    if symbols is not None:
+        query = query.filter(ScreenerPersistence.symbol.in_(set(symbols)))
+    return {p.symbol: p for p in query.all()}
+
+
+# ➕ Fold one saved run into the table (call after the result rows are saved)
+def record_screener_run(screener, symbols, day=None):
+    day = day or date.today()
+    model = SCREENER_MODELS[screener]
+    previous_run = db.session.query(func.max(model.date)).filter(model.date < day).scalar()
+    existing = _persistence_rows(screener)
+
+    rows = []
+    for symbol in set(symbols):
+        p = existing.get(symbol)
+        if p is None or not p.days_present:
+            rows.append(dict(screener=screener, symbol=symbol, days_present=1, current_streak=1,
+                             first_seen=day, last_seen=day))
+        elif p.last_seen < day:
+            streak = p.current_streak + 1 if p.last_seen == previous_run else 1
+            rows.append(dict(screener=screener, symbol=symbol, days_present=p.days_present + 1,
+                             current_streak=streak, first_seen=p.first_seen, last_seen=day))
+        # last_seen == day: same-day re-run, the history row was updated in place
+
+    upsert_rows(ScreenerPersistence, rows, keys=("screener", "symbol"))
+
+    # Symbols missing from this run lose their streak
+    ScreenerPersistence.query.filter(
+        ScreenerPersistence.screener == screener,
+        ScreenerPersistence.last_seen < day,
+        ScreenerPersistence.current_streak != 0,
+    ).update({ScreenerPersistence.current_streak: 0}, synchronize_session=False)
+    db.session.commit()
+
+
+# 🧹 Delete history rows older than the retention window and keep the counts in step
+def purge_screener_rows(screener, days=RETENTION_DAYS):
+    model = SCREENER_MODELS[screener]
+    cutoff = date.today() - timedelta(days=days)
+
+    # Counts come from the rows this DELETE removed, so concurrent purges never subtract twice
+    purged = Counter(db.session.execute(
+        delete(model).where(model.date < cutoff).returning(model.symbol)
+    ).scalars())
+    if purged:
+        counts = _persistence_rows(screener, purged)
+        db.session.execute(update(ScreenerPersistence), [
+            {"screener": screener, "symbol": symbol, "days_present": max(p.days_present - purged[symbol], 0)}
+            for symbol, p in counts.items()
+        ])
+        ScreenerPersistence.query.filter_by(screener=screener).filter(
+            ScreenerPersistence.days_present <= 0
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    cache.set(PURGE_MARKER.format(screener), date.today().isoformat(), timeout=24 * 60 * 60)
+    return sum(purged.values())
+
+
+# 🔧 Recompute a screener's persistence rows from its history table
+def rebuild_persistence(screener):
+    model = SCREENER_MODELS[screener]
+    rows = db.session.query(model.symbol, model.date).all()  # purges keep the table to the window
+
+    runs = sorted({d for _, d in rows}, reverse=True)
+    seen = {}
+    for symbol, d in rows:
+        seen.setdefault(symbol, set()).add(d)
+
+    records = []
+    for symbol, dates in seen.items():
+        streak = 0
+        for run in runs:
+            if run not in dates:
+                break
+            streak += 1
+        records.append(dict(screener=screener, symbol=symbol, days_present=len(dates),
+                            current_streak=streak, first_seen=min(dates), last_seen=max(dates)))
+
+    ScreenerPersistence.query.filter_by(screener=screener).delete()
+    db.session.add_all(ScreenerPersistence(**r) for r in records)
+    db.session.commit()
+    return len(records)
@@ -1,11 +1,33 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import func
 from app.models import Trade
-from collections import defaultdict
-from datetime import datetime, timedelta
+from app.extensions import db
+from datetime import date, datetime, timedelta
 
 calendar_bp = Blueprint('calendar', __name__)
 
+MAX_RANGE_DAYS = 3 * 366  # /calendar/data window cap (heatmaps ask for a year)
+
+# 📅 Per-day realized P&L, trade count and symbols for [start, end] in one grouped query
+def get_calendar_days(user_id, start, end):
+    pnl = Trade.exited_amount - Trade.invested_amount
+    rows = db.session.query(
+        Trade.exit_date,
+        func.sum(pnl),
+        func.count(Trade.id),
+        func.aggregate_strings(Trade.stock_name, ","),  # string_agg on PostgreSQL, group_concat on SQLite
+    ).filter(
+        Trade.user_id == user_id,
+        Trade.status == "Closed",
+        Trade.exit_date.between(start, end),
+    ).group_by(Trade.exit_date).order_by(Trade.exit_date).all()
+
+    return {
+        exit_date.strftime("%Y-%m-%d"): {"pnl": total, "trades": count, "stocks": stocks.split(",")}
+        for exit_date, total, count, stocks in rows
+    }
+
 @calendar_bp.route('/calendar')
 @login_required
 def calendar_view():
@@ -13,14 +35,9 @@ def calendar_view():
     month = int(request.args.get("month", today.month))
     year = int(request.args.get("year", today.year))
 
-    trades = Trade.query.filter_by(user_id=current_user.id, status='closed').all()
-    daily_pnl = defaultdict(lambda: {"pnl": 0.0, "stocks": []})
-
-    for trade in trades:
-        if trade.exit_date and trade.exit_date.month == month and trade.exit_date.year == year:
-            date_str = trade.exit_date.strftime("%Y-%m-%d")
-            daily_pnl[date_str]["pnl"] += trade.pnl
-            daily_pnl[date_str]["stocks"].append(trade.stock_name)
+    month_start = date(year, month, 1)
+    month_end = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    daily_pnl = get_calendar_days(current_user.id, month_start, month_end)
 
     return render_template("calendar.html",
                            month=month,
@@ -29,3 +46,26 @@ def calendar_view():
                            daily_pnl=daily_pnl,
                            datetime=datetime,
                            timedelta=timedelta)
+
+# 📡 Heatmap data: /calendar/data?from=YYYY-MM-DD&to=YYYY-MM-DD (defaults to the last 12 months)
+@calendar_bp.route('/calendar/data')
+@login_required
+def calendar_data():
+    today = date.today()
+    try:
+        end = date.fromisoformat(request.args["to"]) if request.args.get("to") else today
+        start = date.fromisoformat(request.args["from"]) if request.args.get("from") else end - timedelta(days=365)
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD dates"}), 400
+    if start > end:
+        return jsonify({"error": "from must not be after to"}), 400
+    if (end - start).days > MAX_RANGE_DAYS:
+        return jsonify({"error": f"range is limited to {MAX_RANGE_DAYS} days"}), 400
+
+    days = get_calendar_days(current_user.id, start, end)
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "days": [{"date": day, "pnl": round(info["pnl"], 2), "trades": info["trades"], "stocks": info["stocks"]}
+                 for day, info in days.items()],
+    })
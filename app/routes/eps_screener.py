@@ -1,14 +1,24 @@
+import hashlib
 import os
 import pandas as pd
 import yfinance as yf
-from flask import Blueprint, render_template, request, flash
+from flask import Blueprint, render_template, request, flash, redirect, url_for
 from datetime import datetime
 from app.extensions import db
 from app.models import EPSScreenerResult
+from app.bar_store import get_bars
+from app.jobs import submit_job, job_result, job_flash, report_progress
+from app.extensions import cache
+from app.user_cache import cache_lookup
 from sqlalchemy import and_
 
 eps_bp = Blueprint("eps", __name__)
-eps_cache = {}
+EPS_CACHE_TIMEOUT = 24 * 60 * 60
+
+# 🗝 Shared-cache key for an EPS run over a symbol list (hashed - the lists run to hundreds of symbols)
+def eps_cache_key(prefix, symbols):
+    digest = hashlib.sha1("|".join(sorted(symbols)).encode()).hexdigest()
+    return f"eps:{prefix}:{digest}"
 
 # 💾 Save EPS result to DB using SQLAlchemy
 def save_to_db(entry):
@@ -45,11 +55,12 @@ def save_to_db(entry):
 # 📊 EPS Screener Core
 def fetch_eps_data(symbols):
     results = []
-    for symbol in symbols:
+    for i, symbol in enumerate(symbols, start=1):
+        report_progress(i, len(symbols))
         try:
             ticker = yf.Ticker(symbol)
             info = ticker.info
-            hist = ticker.history(period="6mo")
+            hist = get_bars(symbol, days=182)
 
             used_real_eps = False
             eps_q1 = eps_q2 = eps_q3 = 0
@@ -97,7 +108,7 @@ def fetch_eps_data(symbols):
                 save_to_db(entry)
         except Exception as e:
             print(f"⚠️ Error processing {symbol}: {e}")
-            flash(f"⚠️ Error processing {symbol}: {str(e)}", "error")
+            job_flash(f"⚠️ Error processing {symbol}: {str(e)}", "error")
 
     results.sort(key=lambda x: sum(x["eps_growth"]), reverse=True)
     return results
@@ -105,6 +116,9 @@ def fetch_eps_data(symbols):
 # 🔘 Route: EPS Screener View
 @eps_bp.route("/eps-screener")
 def eps_screener_view():
+    result = job_result(request.args.get("job"), "eps_from_file")
+    if result:
+        return render_template("eps_screener.html", **result)
     return render_template("eps_screener.html", results_csv=[], results_manual=[], source_name=None)
 
 # 📂 Route: Screener from CSV
@@ -114,18 +128,21 @@ def eps_screener_from_file():
     if not os.path.exists(path):
         return render_template("eps_screener.html", results_csv=[], results_manual=[], error=f"⚠️ Source file not found: {path}")
 
+    job = submit_job("eps_from_file", run_eps_from_file, "eps.eps_screener_view", path, "MCAPge250cr-50 Only")
+    return redirect(url_for("jobs.job_page", job_id=job.id))
+
+# ⚙️ EPS screener over a CSV (background job) - returns the eps_screener.html context
+def run_eps_from_file(path, source_name):
     df = pd.read_csv(path)
     symbols = [s + ".NS" for s in df["symbol"].dropna().unique()]
-    source_name = "MCAPge250cr-50 Only"
-    cache_key = "|".join(sorted(symbols))
+    cache_key = eps_cache_key("file", symbols)
 
-    if cache_key in eps_cache:
-        results_csv = eps_cache[cache_key]
-    else:
+    results_csv = cache_lookup("eps", cache_key)
+    if results_csv is None:
         results_csv = fetch_eps_data(symbols)
-        eps_cache[cache_key] = results_csv
+        cache.set(cache_key, results_csv, timeout=EPS_CACHE_TIMEOUT)
 
-    return render_template("eps_screener.html", results_csv=results_csv, results_manual=[], source_name=source_name)
+    return dict(results_csv=results_csv, results_manual=[], source_name=source_name)
 
 # 🔍 Route: Screener from Form
 @eps_bp.route("/eps-screener/from-form", methods=["POST"])
@@ -152,14 +169,14 @@ def eps_screener_stage2_eps():
     df = pd.read_csv(path)
     symbols = [s + ".NS" if not s.endswith(".NS") else s for s in df["symbol"].dropna().unique()]
     source_name = "Stage 2 + EPS Surge"
-    cache_key = "stage2|" + "|".join(sorted(symbols))
+    cache_key = eps_cache_key("stage2", symbols)
 
-    if cache_key in eps_cache:
-        results_csv = eps_cache[cache_key]
+    results_csv = cache_lookup("eps", cache_key)
+    if results_csv is not None:
         summary = f"✅ Loaded {len(results_csv)} stocks from cache."
     else:
         results_csv = fetch_eps_data(symbols)
-        eps_cache[cache_key] = results_csv
+        cache.set(cache_key, results_csv, timeout=EPS_CACHE_TIMEOUT)
         summary = f"✅ Found {len(results_csv)} stocks with EPS surge from Stage 2 list."
 
     if not results_csv:
@@ -1,13 +1,16 @@
-from flask import Blueprint, request, send_file
+from flask import Blueprint, current_app, request, send_file, redirect, url_for, abort
 from flask_login import login_required, current_user
 from io import BytesIO
 import pandas as pd
-from datetime import date, timedelta, datetime
-from app.models import Trade
-from app.routes.stats_helpers import (
-    calculate_realized_pnl, is_win, holding_days,
-    get_equity_curve, get_stock_stats
-)
+from datetime import date, datetime
+from app.models import Trade, ScreenerJob
+from app.extensions import db, cache
+from app.jobs import submit_job, job_result, report_progress
+from app.trade_query import TRADE_PNL, trade_query
+from app.user_cache import cache_lookup, etag_by_data_version, user_cache_key
+from app.routes.stats_helpers import TradeMetrics, trade_metrics
+from app.streaming_export import csv_response, file_response, xlsx_response
+from app.parquet_export import PARQUET_TABLES, build_parquet_export, parquet_available
 
 
 from reportlab.lib.pagesizes import A4
@@ -17,150 +20,192 @@ from reportlab.lib.styles import getSampleStyleSheet
 
 export_bp = Blueprint('export', __name__)
 
-# 🔧 Time-based trade filter
+TRADE_COLUMNS = (Trade.stock_name, Trade.entry_date, Trade.exit_date, Trade.status, TRADE_PNL, Trade.total_buy_qty)
+
+# 🔧 Trades in the time range (filtered in SQL) -> one TradeMetrics record per trade
 def get_filtered_trades(user_id, filter_range):
-    today = date.today()
-    if filter_range == 'last_7_days':
-        start_date = today - timedelta(days=7)
-    elif filter_range == 'last_30_days':
-        start_date = today - timedelta(days=30)
-    elif filter_range == 'last_90_days':
-        start_date = today - timedelta(days=90)
-    elif filter_range == 'ytd':
-        start_date = date(today.year, 1, 1)
-    elif filter_range == 'last_year':
-        start_date = date(today.year - 1, 1, 1)
-        end_date = date(today.year - 1, 12, 31)
-    else:
-        start_date = None
+    query = trade_query(user_id, *TRADE_COLUMNS, range_name=filter_range)
+    return [TradeMetrics(*row) for row in query.order_by(Trade.id)]
+
+# 🧮 Summary metrics of the closed trades, in exit-date order, through the numpy kernel
+def closed_trade_metrics(trades):
+    closed = sorted((t for t in trades if t.status == "Closed"), key=lambda t: t.exit_date or date.min)
+    return trade_metrics([t.pnl for t in closed], [t.hold_days for t in closed])
+
+# Same metrics straight from SQL - only the closed trades' P&L and dates are loaded
+def filtered_trade_metrics(user_id, filter_range):
+    rows = trade_query(user_id, TRADE_PNL, Trade.entry_date, Trade.exit_date,
+                       range_name=filter_range, status="Closed") \
+        .order_by(Trade.exit_date.asc().nulls_first(), Trade.id).all()
+    hold_days = [(exit_date - entry_date).days if entry_date and exit_date else 0 for _, entry_date, exit_date in rows]
+    return trade_metrics([pnl for pnl, _, _ in rows], hold_days)
+
+def _summary_rows(metrics):
+    return [
+        ['Realized P&L', f"₹{metrics['realized_pnl']:.2f}"],
+        ['Win Rate', f"{metrics['win_rate']}%"],
+        ['Expectancy', f"₹{metrics['expectancy']:.2f}"],
+        ['Profit Factor', f"{metrics['profit_factor']}"],
+        ['Max Drawdown', f"₹{metrics['max_drawdown']:.2f}"]
+    ]
+
+EXPORT_COLUMNS = ['Stock', 'Entry Date', 'Exit Date', 'P&L', 'Status']
+EXPORT_BATCH_SIZE = 1000
+
+# 📤 Trade rows streamed in id order from a server-side cursor
+def _export_rows(user_id, filter_range):
+    query = trade_query(user_id, Trade.stock_name, Trade.entry_date, Trade.exit_date, TRADE_PNL, Trade.status,
+                        range_name=filter_range)
+    for row in query.order_by(Trade.id).yield_per(EXPORT_BATCH_SIZE):
+        yield list(row)
+
+PDF_TABLE_ROWS = 36  # trade rows per table - exactly one A4 page
+PDF_CACHE_TIMEOUT = 24 * 60 * 60
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#343a40')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+TRADE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey])
+])
+
+# 🧾 Trade History Report PDF. Trades go into page-sized tables: reportlab splits one
+# huge table page by page, re-measuring the remainder each time (roughly quadratic).
+def build_trades_pdf(trades, metrics, last_computed, chunk_rows=PDF_TABLE_ROWS):
+    output = BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    elements.append(Paragraph("Trade History Report", styles['Title']))
+    elements.append(Spacer(1, 12))
+    elements.append(Paragraph(f"📅 Stats last computed: {last_computed}", styles['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # 📈 Metrics summary
+    summary_table = Table([['Metric', 'Value']] + _summary_rows(metrics))
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
+    elements.append(summary_table)
+    elements.append(Spacer(1, 20))
+
+    # 📋 Trade tables
+    for start in range(0, max(len(trades), 1), chunk_rows):
+        table_data = [['Stock', 'Entry Date', 'Exit Date', 'P&L', 'Status']]
+        for t in trades[start:start + chunk_rows]:
+            table_data.append([
+                t.stock,
+                t.entry_date.strftime('%Y-%m-%d') if t.entry_date else '',
+                t.exit_date.strftime('%Y-%m-%d') if t.exit_date else '',
+                f"₹{t.pnl:.2f}",
+                t.status
+            ])
+        trade_table = Table(table_data, repeatRows=1)
+        trade_table.setStyle(TRADE_TABLE_STYLE)
+        elements.append(trade_table)
+
+    pages = len(trades) // chunk_rows + 2
+    doc.build(elements, onLaterPages=lambda canvas, doc: report_progress(min(doc.page, pages), pages))
+    return output.getvalue()
+
+# ⚙️ PDF report (background job) - the file lands in the cache, the job returns its key
+def run_pdf_report(user_id, filter_range, cache_key):
+    trades = get_filtered_trades(user_id, filter_range)
+    last_computed = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    pdf = build_trades_pdf(trades, closed_trade_metrics(trades), last_computed)
+    cache.set(cache_key, pdf, timeout=PDF_CACHE_TIMEOUT)
+    return {'cache_key': cache_key, 'range': filter_range}
+
+# 🔁 The queued/running job already building this report, if any (repeat clicks join it)
+def _pdf_job_in_progress(cache_key):
+    job = db.session.get(ScreenerJob, cache.get(f"{cache_key}:job") or '')
+    if job is None or job.kind != 'pdf_report' or job.user_id != current_user.id:
+        return None
+    return job if job.status in ('queued', 'running') else None
 
-    trades = Trade.query.filter_by(user_id=user_id).all()
-    if start_date:
-        trades = [t for t in trades if t.exit_date and t.exit_date >= start_date]
-    if filter_range == 'last_year':
-        trades = [t for t in trades if t.exit_date and start_date <= t.exit_date <= end_date]
-    return trades
+def _pdf_response(pdf, download_name):
+    return send_file(BytesIO(pdf), download_name=download_name, as_attachment=True, mimetype='application/pdf')
 
 # 📤 Export trades + metrics
 @export_bp.route('/export')
 @login_required
+@etag_by_data_version("trades")
 def export_history():
     filter_range = request.args.get('range', 'all_time')
     output_format = request.args.get('format', 'excel')
-    trades = get_filtered_trades(current_user.id, filter_range)
-    last_computed = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    # 📊 Compute metrics
-    closed_trades = [t for t in trades if t.status == "Closed"]
-    win_trades = [t for t in closed_trades if is_win(t)]
-    loss_trades = [t for t in closed_trades if not is_win(t)]
-
-    realized_pnl = sum(calculate_realized_pnl(t) for t in closed_trades)
-    win_rate = round((len(win_trades) / len(closed_trades)) * 100, 2) if closed_trades else 0
-    expectancy = round(realized_pnl / len(closed_trades), 2) if closed_trades else 0
-    gross_profit = sum(calculate_realized_pnl(t) for t in win_trades)
-    gross_loss = sum(calculate_realized_pnl(t) for t in loss_trades)
-    profit_factor = round(gross_profit / abs(gross_loss), 2) if gross_loss else 0
-    equity_curve, max_drawdown = get_equity_curve(closed_trades)
 
+    # 🧾 PDF: served from the cache until the journal changes, otherwise built in the background
     if output_format == 'pdf':
-        output = BytesIO()
-        doc = SimpleDocTemplate(output, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        elements.append(Paragraph("Trade History Report", styles['Title']))
-        elements.append(Spacer(1, 12))
-        elements.append(Paragraph(f"📅 Stats last computed: {last_computed}", styles['Normal']))
-        elements.append(Spacer(1, 12))
-
-
-        # 📈 Metrics summary
-        summary = [
-            ['Metric', 'Value'],
-            ['Realized P&L', f"₹{realized_pnl:.2f}"],
-            ['Win Rate', f"{win_rate}%"],
-            ['Expectancy', f"₹{expectancy:.2f}"],
-            ['Profit Factor', f"{profit_factor}"],
-            ['Max Drawdown', f"₹{max_drawdown:.2f}"]
-        ]
-        summary_table = Table(summary)
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#343a40')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
-
-        # 📋 Trade table
-        table_data = [['Stock', 'Entry Date', 'Exit Date', 'P&L', 'Status']]
-        for t in trades:
-            table_data.append([
-                t.stock_name,
-                t.entry_date.strftime('%Y-%m-%d') if t.entry_date else '',
-                t.exit_date.strftime('%Y-%m-%d') if t.exit_date else '',
-                f"₹{calculate_realized_pnl(t):.2f}",
-                t.status
-            ])
-        trade_table = Table(table_data, repeatRows=1)
-        trade_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.whitesmoke, colors.lightgrey])
-        ]))
-        elements.append(trade_table)
-        doc.build(elements)
-        output.seek(0)
-        return send_file(output, download_name='trades.pdf', as_attachment=True, mimetype='application/pdf')
-
-    else:
-        output = BytesIO()
-        data = []
-        for t in trades:
-            data.append({
-                'Stock': t.stock_name,
-                'Entry Date': t.entry_date,
-                'Exit Date': t.exit_date,
-                'P&L': calculate_realized_pnl(t),
-                'Status': t.status
-            })
-        df = pd.DataFrame(data)
-        metrics_df = pd.DataFrame({
-            'Metric': ['Realized P&L', 'Win Rate', 'Expectancy', 'Profit Factor', 'Max Drawdown'],
-            'Value': [f"₹{realized_pnl:.2f}", f"{win_rate}%", f"₹{expectancy:.2f}", f"{profit_factor}", f"₹{max_drawdown:.2f}"]
-        })
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='Trades')
-            metrics_df.to_excel(writer, index=False, sheet_name='Summary')
-        output.seek(0)
-        return send_file(output, download_name='trades.xlsx', as_attachment=True, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        cache_key = user_cache_key("pdf_report", current_user.id, filter_range, date.today())
+        pdf = cache_lookup("pdf_report", cache_key)
+        if pdf is not None:
+            return _pdf_response(pdf, 'trades.pdf')
+        job = _pdf_job_in_progress(cache_key)
+        if job is None:
+            job = submit_job("pdf_report", run_pdf_report, "export.pdf_report", current_user.id, filter_range, cache_key)
+            cache.set(f"{cache_key}:job", job.id, timeout=current_app.config["JOB_TIMEOUT"])
+        return redirect(url_for("jobs.job_page", job_id=job.id))
+
+    # 🗂 Parquet: trades + entries + exits in a zip, or one table with &table=
+    if output_format == 'parquet':
+        if not parquet_available():
+            abort(501, description="Parquet export needs the pyarrow package (pip install pyarrow)")
+        table = request.args.get('table')
+        if table and table not in PARQUET_TABLES:
+            abort(400, description=f"table must be one of {', '.join(PARQUET_TABLES)}")
+        trade_ids = trade_query(current_user.id, Trade.id, range_name=filter_range).scalar_subquery()
+        output = build_parquet_export(trade_ids, table)
+        if table:
+            return file_response(output, f'{table}.parquet', 'application/vnd.apache.parquet')
+        return file_response(output, 'trades_parquet.zip', 'application/zip')
+
+    # 📦 Excel / CSV: trade rows are streamed; Excel also gets the summary metrics sheet
+    rows = _export_rows(current_user.id, filter_range)
+    if output_format == 'csv':
+        return csv_response('trades.csv', EXPORT_COLUMNS, rows)
+    metrics = filtered_trade_metrics(current_user.id, filter_range)
+    return xlsx_response('trades.xlsx', [
+        ('Trades', EXPORT_COLUMNS, rows),
+        ('Summary', ['Metric', 'Value'], _summary_rows(metrics)),
+    ])
+
+# 📥 Finished PDF job -> the cached file (rebuilt here if it has been evicted meanwhile)
+@export_bp.route('/export/report')
+@login_required
+def pdf_report():
+    job = db.session.get(ScreenerJob, request.args.get('job', ''))
+    if job is None or job.user_id != current_user.id:
+        abort(404)
+    result = job_result(job.id, 'pdf_report')
+    if result is None:
+        abort(404)
+    pdf = cache.get(result['cache_key'])
+    if pdf is None:
+        run_pdf_report(current_user.id, result['range'], result['cache_key'])
+        pdf = cache.get(result['cache_key'])
+    return _pdf_response(pdf, 'trades.pdf')
 
 # 📊 Export metrics only
 @export_bp.route('/export/stats')
 @login_required
+@etag_by_data_version("trades")
 def export_stats_only():
     filter_range = request.args.get('range', 'all_time')
     output_format = request.args.get('format', 'excel')
-    trades = get_filtered_trades(current_user.id, filter_range)
-    closed_trades = [t for t in trades if t.status == "Closed"]
-    win_trades = [t for t in closed_trades if is_win(t)]
-    loss_trades = [t for t in closed_trades if not is_win(t)]
     last_computed = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    realized_pnl = sum(calculate_realized_pnl(t) for t in closed_trades)
-    win_rate = round((len(win_trades) / len(closed_trades)) * 100, 2) if closed_trades else 0
-    expectancy = round(realized_pnl / len(closed_trades), 2) if closed_trades else 0
-    gross_profit = sum(calculate_realized_pnl(t) for t in win_trades)
-    gross_loss = sum(calculate_realized_pnl(t) for t in loss_trades)
-    profit_factor = round(gross_profit / abs(gross_loss), 2) if gross_loss else 0
-    equity_curve, max_drawdown = get_equity_curve(closed_trades)
+    metrics = filtered_trade_metrics(current_user.id, filter_range)
+    realized_pnl, win_rate, expectancy = metrics['realized_pnl'], metrics['win_rate'], metrics['expectancy']
+    profit_factor, max_drawdown = metrics['profit_factor'], metrics['max_drawdown']
 
     output = BytesIO()
     if output_format == 'pdf':
@@ -0,0 +1,44 @@
+from flask import Blueprint, current_app, render_template, jsonify, url_for, abort
+from flask_login import login_required
+import json
+from app.extensions import db
+from app.models import ScreenerJob
+from app.jobs import can_view_job, fail_stale_jobs
+
+jobs_bp = Blueprint("jobs", __name__)
+
+# kind -> (page heading, what processed/total count)
+JOB_LABELS = {"pdf_report": ("📄 Building PDF report…", "pages")}
+DEFAULT_JOB_LABEL = ("⏳ Screener running…", "symbols")
+
+def _get_job(job_id):
+    job = db.session.get(ScreenerJob, job_id)
+    if job is None or not can_view_job(job):
+        abort(404)
+    return job
+
+# ⏳ Progress page - polls the status endpoint, then opens the result page
+@jobs_bp.route("/jobs/<job_id>")
+@login_required
+def job_page(job_id):
+    job = _get_job(job_id)
+    heading, unit = JOB_LABELS.get(job.kind, DEFAULT_JOB_LABEL)
+    return render_template("job_status.html", job=job, heading=heading, unit=unit)
+
+# 📡 Job status (polled by the progress page)
+@jobs_bp.route("/jobs/<job_id>/status")
+@login_required
+def job_status(job_id):
+    job = _get_job(job_id)
+    if job.status in ("queued", "running") and fail_stale_jobs(current_app.config["JOB_TIMEOUT"], job.id):
+        db.session.refresh(job)
+    return jsonify({
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress or 0,
+        "processed": job.processed or 0,
+        "total": job.total or 0,
+        "errors": [message for _, message in json.loads(job.errors or "[]")],
+        "result_url": url_for(job.result_endpoint, job=job.id) if job.status == "finished" else None,
+    })
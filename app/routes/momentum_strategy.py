@@ -3,7 +3,8 @@ from datetime import datetime, timedelta
 from app.routes.performers import get_top_performers
 from app.models import db, MomentumPortfolio, MomentumTrade
 from app.utils import get_current_price
-from flask import Blueprint, render_template, flash, request
+from app.jobs import submit_job, job_result, job_flash
+from flask import Blueprint, render_template, flash, request, redirect, url_for
 
 
 
@@ -30,7 +31,7 @@ def run_momentum_strategy():
 
 
     if today.date() != next_schedule_date:
-        flash("⚠️ Strategy is designed to run only on the first working day of each month.", "warning")
+        job_flash("⚠️ Strategy is designed to run only on the first working day of each month.", "warning")
 
     # Step 1: Get top 20 performers from nifty_500
     top_20 = get_top_performers("data/nifty_500.csv", top_n=20)
@@ -81,6 +82,9 @@ def run_momentum_strategy():
 
 @momentum_bp.route('/momentum/rebalance', methods=["GET"])
 def momentum_rebalance_view():
+    result = job_result(request.args.get("job"), "momentum_rebalance")
+    if result:
+        return render_template("momentum_result.html", **result)
     return render_template("momentum_result.html",
                         removed=[],
                         added=[],
@@ -90,16 +94,20 @@ def momentum_rebalance_view():
 
 @momentum_bp.route('/momentum/rebalance', methods=["POST"])
 def momentum_rebalance_process():
+    job = submit_job("momentum_rebalance", run_momentum_rebalance, "momentum.momentum_rebalance_view")
+    return redirect(url_for("jobs.job_page", job_id=job.id))
+
+# ⚙️ Rebalance run (background job) - returns the momentum_result.html context
+def run_momentum_rebalance():
     removed, added, run_date, next_schedule_date = run_momentum_strategy()
 
     summary_message = f"✅ Rebalance completed on {run_date.strftime('%d %b %Y')}"
 
-    return render_template("momentum_result.html",
-                           removed=removed,
-                           added=added,
-                           run_date=run_date,
-                           next_schedule_date=next_schedule_date,
-                           summary_message=summary_message)
+    return dict(removed=[{"symbol": t.symbol, "buy_price": t.buy_price} for t in removed],
+                added=added,
+                run_date=run_date,
+                next_schedule_date=next_schedule_date,
+                summary_message=summary_message)
 
 
 @momentum_bp.route('/momentum/history')
@@ -2,19 +2,34 @@ from flask import request, redirect, url_for, Blueprint, render_template, flash
 import pandas as pd
 import yfinance as yf
 import os
-from functools import lru_cache
-from datetime import datetime, timedelta
-from sqlalchemy import and_
-from app.extensions import db
+from datetime import date, datetime, timedelta
 from app.models import DeliverySurgeStock
+from app.bar_store import get_bars
+from app.upsert import upsert_rows
+from app.persistence import get_persistence, persistence_tag, purge_screener_rows, record_screener_run
+from app.jobs import submit_job, job_result, job_flash, report_progress
+from app.extensions import cache
+from app.user_cache import cache_lookup
 
 performers_bp = Blueprint("performers", __name__)
 
-@lru_cache(maxsize=128)
+RETURN_CACHE_TIMEOUT = 24 * 60 * 60
+
+# 📈 1-year return, cached per symbol per day in the shared cache (all workers reuse it)
 def get_1yr_return(symbol, suffix=".NS"):
+    cache_key = f"1yr_return:{symbol}{suffix}:{date.today()}"
+    cached = cache_lookup("1yr_return", cache_key)
+    if cached is not None:
+        return cached
+
+    result = _compute_1yr_return(symbol, suffix)
+    if result is not None:
+        cache.set(cache_key, result, timeout=RETURN_CACHE_TIMEOUT)
+    return result
+
+def _compute_1yr_return(symbol, suffix):
     try:
-        ticker = yf.Ticker(symbol + suffix)
-        hist = ticker.history(period="1y", interval="1d")
+        hist = get_bars(symbol + suffix, days=365)
         if hist.empty or len(hist) < 2:
             return None
         start_price = hist["Close"].iloc[0]
@@ -32,7 +47,7 @@ def get_1yr_return(symbol, suffix=".NS"):
 
 def get_top_performers(csv_file, top_n=12, suffix=".NS"):
     if not os.path.exists(csv_file):
-        flash(f"CSV file not found: {csv_file}", "error")
+        job_flash(f"CSV file not found: {csv_file}", "error")
         return []
 
     try:
@@ -40,7 +55,8 @@ def get_top_performers(csv_file, top_n=12, suffix=".NS"):
         df.columns = df.columns.str.strip().str.lower()
         results = []
 
-        for symbol in df["symbol"]:
+        for i, symbol in enumerate(df["symbol"], start=1):
+            report_progress(i, len(df))
             data = get_1yr_return(symbol, suffix)
             if data:
                 results.append({
@@ -56,11 +72,15 @@ def get_top_performers(csv_file, top_n=12, suffix=".NS"):
         top_df["rank"] = top_df.index + 1
         return top_df.to_dict(orient="records")
     except Exception as e:
-        flash(f"Error processing {csv_file}: {e}", "error")
+        job_flash(f"Error processing {csv_file}: {e}", "error")
         return []
 
 @performers_bp.route("/top-performers", methods=["GET"])
 def top_performers_view():
+    result = job_result(request.args.get("job"), "top_performers")
+    if result:
+        result["last_processed_time"] = datetime.fromisoformat(result["last_processed_time"])
+        return render_template("top_performers.html", **result)
     return render_template("top_performers.html",
                            nifty_200=[],
                            nifty_500=[],
@@ -74,6 +94,11 @@ def top_performers_view():
 
 @performers_bp.route("/top-performers", methods=["POST"])
 def top_performers_process():
+    job = submit_job("top_performers", run_top_performers, "performers.top_performers_view")
+    return redirect(url_for("jobs.job_page", job_id=job.id))
+
+# ⚙️ Top performers run (background job) - returns the top_performers.html context
+def run_top_performers():
     nifty_200 = get_top_performers("data/nifty_200.csv", top_n=25, suffix=".NS")
     nifty_500 = get_top_performers("data/nifty_500.csv", top_n=25, suffix=".NS")
     bse_200 = get_top_performers("data/bse_200.csv", top_n=25, suffix=".BO")
@@ -90,16 +115,15 @@ def top_performers_process():
 
     summary_message = f"✅ Screener completed at {last_processed_time.strftime('%d %b %Y %I:%M %p')}"
 
-    return render_template("top_performers.html",
-                           nifty_200=nifty_200,
-                           nifty_500=nifty_500,
-                           bse_200=bse_200,
-                           overlap_n200_bse=overlap_n200_bse,
-                           overlap_n200_n500=overlap_n200_n500,
-                           overlap_bse_n500=overlap_bse_n500,
-                           overlap_all=overlap_all,
-                           last_processed_time=last_processed_time,
-                           summary_message=summary_message)
+    return dict(nifty_200=nifty_200,
+                nifty_500=nifty_500,
+                bse_200=bse_200,
+                overlap_n200_bse=overlap_n200_bse,
+                overlap_n200_n500=overlap_n200_n500,
+                overlap_bse_n500=overlap_bse_n500,
+                overlap_all=overlap_all,
+                last_processed_time=last_processed_time,
+                summary_message=summary_message)
 
 
 @performers_bp.route("/upload-csv", methods=["POST"])
@@ -128,7 +152,7 @@ def analyze_stock(ticker, benchmark_hist=None):
         if market_cap < 100 * 10**7:
             return None
 
-        hist = stock.history(period="30d")
+        hist = get_bars(ticker, days=30)
         if hist.empty or len(hist) < 22:
             return None
 
@@ -162,13 +186,13 @@ def analyze_stock(ticker, benchmark_hist=None):
 
 def filter_delivery_surge_stocks(save_to_db=True):
     tickers = load_nifty500_tickers()
-    benchmark_hist = yf.Ticker("^NSEI").history(period="30d")
+    benchmark_hist = get_bars("^NSEI", days=30)
     today = datetime.today().date()
     results = []
-    inserted = 0
-    updated = 0
+    rows = []
 
-    for ticker in tickers:
+    for i, ticker in enumerate(tickers, start=1):
+        report_progress(i, len(tickers))
         data = analyze_stock(ticker, benchmark_hist=benchmark_hist)
         if not data:
             continue
@@ -179,44 +203,21 @@ def filter_delivery_surge_stocks(save_to_db=True):
         ):
             results.append(data)
 
-            if save_to_db:
-                existing = DeliverySurgeStock.query.filter(
-                    and_(
-                        DeliverySurgeStock.symbol == ticker,
-                        DeliverySurgeStock.date == today
-                    )
-                ).first()
-
-                if existing:
-                    fields = {
-                        "price": data["current_price"],
-                        "volume": data["volume"],
-                        "delivery_spike": data["delivery_spike"],
-                        "roc_21d": data["roc_21d"],
-                        "rs_vs_index_21d": data["rs_vs_index_21d"]
-                    }
-                    changed = False
-                    for field, new_val in fields.items():
-                        if getattr(existing, field) != new_val:
-                            setattr(existing, field, new_val)
-                            changed = True
-                    if changed:
-                        db.session.add(existing)
-                        updated += 1
-                else:
-                    db.session.add(DeliverySurgeStock(
-                        symbol=ticker,
-                        date=today,
-                        price=data["current_price"],
-                        volume=data["volume"],
-                        delivery_spike=data["delivery_spike"],
-                        roc_21d=data["roc_21d"],
-                        rs_vs_index_21d=data["rs_vs_index_21d"]
-                    ))
-                    inserted += 1
-
+            rows.append({
+                "symbol": ticker,
+                "date": today,
+                "price": data["current_price"],
+                "volume": data["volume"],
+                "delivery_spike": data["delivery_spike"],
+                "roc_21d": data["roc_21d"],
+                "rs_vs_index_21d": data["rs_vs_index_21d"]
+            })
+
+    updated, inserted = 0, 0
     if save_to_db:
-        db.session.commit()
+        updated, inserted = upsert_rows(DeliverySurgeStock, rows)
+        purge_screener_rows("delivery_surge")
+        record_screener_run("delivery_surge", [row["symbol"] for row in rows], today)
 
     summary_message = f"✅ Updated {updated} stocks, added {inserted} new"
     return results, summary_message
@@ -227,6 +228,10 @@ delivery_bp = Blueprint("delivery", __name__)
 
 @delivery_bp.route("/delivery-surge", methods=["GET"])
 def delivery_surge_view():
+    result = job_result(request.args.get("job"), "delivery_surge")
+    if result:
+        result["last_processed_time"] = datetime.fromisoformat(result["last_processed_time"])
+        return render_template("delivery_surge.html", **result)
     return render_template("delivery_surge.html",
                            stocks=[],
                            summary_message=None,
@@ -236,7 +241,11 @@ def delivery_surge_view():
 @delivery_bp.route("/delivery-surge", methods=["POST"])
 def delivery_surge_process():
     sort_by = request.form.get("sort", "delivery_spike")
+    job = submit_job("delivery_surge", run_delivery_surge, "delivery.delivery_surge_view", sort_by)
+    return redirect(url_for("jobs.job_page", job_id=job.id))
 
+# ⚙️ Delivery surge run (background job) - returns the delivery_surge.html context
+def run_delivery_surge(sort_by):
     stocks, summary_message = filter_delivery_surge_stocks(save_to_db=True)
 
     if sort_by == "roc":
@@ -246,11 +255,10 @@ def delivery_surge_process():
     else:
         stocks.sort(key=lambda x: x["delivery_spike"], reverse=True)
 
-    return render_template("delivery_surge.html",
-                           stocks=stocks,
-                           summary_message=summary_message,
-                           last_processed_time=datetime.now(),
-                           sort_by=sort_by)
+    return dict(stocks=stocks,
+                summary_message=summary_message,
+                last_processed_time=datetime.now(),
+                sort_by=sort_by)
 
 
 
@@ -275,22 +283,13 @@ def delivery_history():
 
     stocks = query.order_by(DeliverySurgeStock.date.desc()).all()
 
-    counts = db.session.query(
-        DeliverySurgeStock.symbol,
-        db.func.count(DeliverySurgeStock.date).label("days_present")
-    ).filter(DeliverySurgeStock.date >= cutoff).group_by(DeliverySurgeStock.symbol).all()
-
-    presence_map = {symbol: days for symbol, days in counts}
+    presence_map = get_persistence("delivery_surge", [stock.symbol for stock in stocks])
 
     enriched = []
     for stock in stocks:
-        days = presence_map.get(stock.symbol, 0)
-        tag = (
-            "🔥 30D" if days >= 30 else
-            "📆 15D" if days >= 15 else
-            "🕒 7D" if days >= 7 else
-            "⏳ 3D" if days >= 3 else ""
-        )
+        presence = presence_map.get(stock.symbol)
+        days = presence.days_present if presence else 0
+        tag = persistence_tag(days)
         enriched.append({
             "date": stock.date,
             "symbol": stock.symbol,
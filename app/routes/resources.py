@@ -4,6 +4,7 @@ from io import BytesIO
 import pandas as pd
 from app.models import Resource
 from app.extensions import db  # ✅ Use extensions to avoid circular import
+from app.user_cache import bump_cache_generation, etag_by_data_version
 from datetime import datetime
 from flask_wtf.csrf import validate_csrf, CSRFError  # ✅ CSRF imports
 
@@ -42,6 +43,7 @@ def add_resource():
                        pinned=pinned, user_id=current_user.id)
         db.session.add(new)
         db.session.commit()
+        bump_cache_generation(current_user.id, "resources")
         flash("Resource added successfully!", "success")
 
     except CSRFError:
@@ -69,6 +71,7 @@ def edit_resource(id):
         r.category = request.form.get('category')
         r.pinned = bool(request.form.get('pinned'))
         db.session.commit()
+        bump_cache_generation(current_user.id, "resources")
         flash("Resource updated successfully!", "success")
 
     except CSRFError:
@@ -91,6 +94,7 @@ def delete_resource(id):
         validate_csrf(request.form.get('csrf_token'))  # ✅ Validate CSRF
         db.session.delete(r)
         db.session.commit()
+        bump_cache_generation(current_user.id, "resources")
         flash("Resource deleted.", "success")
 
     except CSRFError:
@@ -104,6 +108,7 @@ def delete_resource(id):
 # ✅ Export Resources (GET only — no CSRF needed)
 @resources_bp.route('/export')
 @login_required
+@etag_by_data_version("resources")
 def export_resources():
     resources = Resource.query.filter_by(user_id=current_user.id).all()
     df = pd.DataFrame([{
@@ -127,4 +132,5 @@ def access_resource(id):
     resource = Resource.query.get_or_404(id)
     resource.last_accessed = datetime.utcnow()
     db.session.commit()
+    bump_cache_generation(resource.user_id, "resources")
     return redirect(resource.url)
@@ -1,11 +1,14 @@
-from flask import Blueprint, render_template,request
+from flask import Blueprint, render_template, request, current_app, redirect, url_for
 import pandas as pd
-import yfinance as yf
 from datetime import date, datetime, timedelta
 from app.models import Stage2Stock
 from app.routes.sector_analysis import analyze_sector
-from app.extensions import db
-from sqlalchemy import func
+from app.market_data import get_benchmark_weekly, download_panel, load_weekly_panel
+from app.routes.stage2_engine import screen_stage2_panel
+from app.bar_store import get_weekly_bars
+from app.upsert import upsert_rows
+from app.persistence import get_persistence, persistence_tag, purge_screener_rows, record_screener_run
+from app.jobs import submit_job, job_result, report_progress
 import os
 import re
 
@@ -15,126 +18,112 @@ screener_bp = Blueprint("screener", __name__)
 def slugify(text):
         return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
 
-# 📦 Fetch weekly data
-def fetch_weekly_data(symbol, weeks=60):
-    ticker = yf.Ticker(symbol)
-    return ticker.history(period=f"{weeks}wk", interval="1wk")
+# 📦 Fetch weekly data (from the local bar store)
+def fetch_weekly_data(symbol, weeks=60, session=None):
+    return get_weekly_bars(symbol, weeks, session=session)
 
 # 📈 Compute relative strength
 def compute_relative_strength(stock_df, index_df):
     rs = stock_df["Close"] / index_df["Close"]
     return rs.rolling(window=10).mean()
 
+# 🧠 Stage 2 rules on one symbol's weekly Close/Volume
+def evaluate_stage2(stock_symbol, stock_df, index_df):
+    if stock_df.empty or index_df.empty or len(stock_df) < 35:
+        return None
+
+    # Align the shared benchmark to this stock's weeks
+    index_df = index_df.reindex(stock_df.index)
+
+    stock_df["30w_ma"] = stock_df["Close"].rolling(window=30).mean()
+    stock_df["vol_avg"] = stock_df["Volume"].rolling(window=10).mean()
+    stock_df["rs"] = compute_relative_strength(stock_df, index_df)
+
+    latest = stock_df.iloc[-1]
+    prev = stock_df.iloc[-2]
+
+    conditions = [
+        latest["Close"] > latest["30w_ma"],
+        latest["30w_ma"] > prev["30w_ma"],
+        latest["Volume"] > latest["vol_avg"],
+        latest["rs"] > prev["rs"]
+    ]
+
+    if all(conditions):
+        return {
+            "symbol": stock_symbol,
+            "price": round(latest["Close"], 2),
+            "30w_ma": round(latest["30w_ma"], 2),
+            "volume": int(latest["Volume"]),
+            "vol_avg": int(latest["vol_avg"]),
+            "rs": round(latest["rs"], 2)
+        }
+    return None
+
 # 🧠 Stage 2 logic
-def is_stage2(stock_symbol, index_symbol="^NSEI"):
+def is_stage2(stock_symbol, index_symbol="^NSEI", index_df=None, session=None):
     try:
-        stock_df = fetch_weekly_data(stock_symbol)
-        index_df = fetch_weekly_data(index_symbol)
-
-        if stock_df.empty or index_df.empty or len(stock_df) < 35:
-            return None
-
-        stock_df["30w_ma"] = stock_df["Close"].rolling(window=30).mean()
-        stock_df["vol_avg"] = stock_df["Volume"].rolling(window=10).mean()
-        stock_df["rs"] = compute_relative_strength(stock_df, index_df)
-
-        latest = stock_df.iloc[-1]
-        prev = stock_df.iloc[-2]
-
-        conditions = [
-            latest["Close"] > latest["30w_ma"],
-            latest["30w_ma"] > prev["30w_ma"],
-            latest["Volume"] > latest["vol_avg"],
-            latest["rs"] > prev["rs"]
-        ]
-
-        if all(conditions):
-            return {
-                "symbol": stock_symbol,
-                "price": round(latest["Close"], 2),
-                "30w_ma": round(latest["30w_ma"], 2),
-                "volume": int(latest["Volume"]),
-                "vol_avg": int(latest["vol_avg"]),
-                "rs": round(latest["rs"], 2)
-            }
+        stock_df = fetch_weekly_data(stock_symbol, session=session)
+        if index_df is None:
+            index_df = get_benchmark_weekly(index_symbol)
+        return evaluate_stage2(stock_symbol, stock_df, index_df)
     except Exception as e:
         print(f"Error screening {stock_symbol}: {e}")
     return None
 
-# 🧪 Screen and rank
-def screen_stage2(symbols):
-    results = []
-    for symbol in symbols:
-        data = is_stage2(symbol)
-        if data and "rs" in data:
-            results.append(data)
-
-    if not results:
-        return pd.DataFrame()  # return empty DataFrame safely
+# 🧪 Screen and rank - both fetch modes build a (week x symbol) panel for the engine
+def screen_stage2(symbols, index_symbol="^NSEI", mode=None, chunk_size=None, session=None):
+    mode = mode or current_app.config.get("STAGE2_FETCH_MODE", "per_symbol")
+    chunk_size = chunk_size or current_app.config.get("SCREENER_CHUNK_SIZE", 100)
 
-    df = pd.DataFrame(results)
+    # Benchmark is loaded once per run and shared by every symbol
+    index_df = get_benchmark_weekly(index_symbol)
+    if index_df.empty:
+        print(f"⚠️ No benchmark data for {index_symbol}.")
+        return pd.DataFrame()
 
-    if "rs" not in df.columns or df["rs"].isnull().all():
-        print("⚠️ No valid 'rs' values found in results.")
-        return pd.DataFrame()  # avoid sorting if rs is missing or all null
+    if mode == "batched":
+        close, volume = download_panel(symbols, period="60wk", interval="1wk",
+                                       chunk_size=chunk_size, session=session)
+    else:
+        close, volume = load_weekly_panel(symbols, session=session)
 
-    df = df[df["rs"].notnull()]  # drop rows with missing rs
-    df.sort_values(by="rs", ascending=False, inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    df["rank"] = df.index + 1
+    df = screen_stage2_panel(close, volume, index_df["Close"])
+    if df.empty:
+        print("⚠️ No Stage 2 candidates found.")
     return df
 
 
 # 💾 Save to DB
 def save_screened_stocks(df):
-    now = datetime.now()
-    updated, inserted = 0, 0
-
-    for _, row in df.iterrows():
-        existing = Stage2Stock.query.filter_by(symbol=row["symbol"], date=now.date()).first()
-
-        if existing:
-            existing.price = row["price"]
-            existing.ma_30w = row["30w_ma"]
-            existing.volume = row["volume"]
-            existing.vol_avg = row["vol_avg"]
-            existing.rs = row["rs"]
-            updated += 1
-        else:
-            stock = Stage2Stock(
-                symbol=row["symbol"],
-                date=now,  # full datetime
-                price=row["price"],
-                ma_30w=row["30w_ma"],
-                volume=row["volume"],
-                vol_avg=row["vol_avg"],
-                rs=row["rs"]
-            )
-            db.session.add(stock)
-            inserted += 1
-
-    db.session.commit()
+    today = date.today()
+    rows = [
+        {
+            "symbol": row["symbol"],
+            "date": today,
+            "price": row["price"],
+            "ma_30w": row["30w_ma"],
+            "volume": row["volume"],
+            "vol_avg": row["vol_avg"],
+            "rs": row["rs"],
+        }
+        for row in df.to_dict("records")
+    ]
+    updated, inserted = upsert_rows(Stage2Stock, rows)
+    record_screener_run("stage2", [row["symbol"] for row in rows], today)
     return updated, inserted
 
 # 🧹 Auto-delete old records
 def delete_old_stage2_records():
-    cutoff = date.today() - timedelta(days=30)
-    deleted = Stage2Stock.query.filter(Stage2Stock.date < cutoff).delete()
-    db.session.commit()
+    deleted = purge_screener_rows("stage2")
     print(f"🧹 Deleted {deleted} old Stage 2 records older than 30 days.")
 
-# 🔁 Get persistence map
-def get_persistent_stage2_stocks():
-    cutoff = date.today() - timedelta(days=30)
-    counts = db.session.query(
-        Stage2Stock.symbol,
-        func.count(Stage2Stock.date).label("days_present")
-    ).filter(Stage2Stock.date >= cutoff).group_by(Stage2Stock.symbol).all()
-    return {symbol: days for symbol, days in counts}
-
 # 🌐 Main stage2 screener route
 @screener_bp.route("/stage2", methods=["GET"])
 def stage2_view():
+    result = job_result(request.args.get("job"), "stage2")
+    if result:
+        return render_template("stage2.html", **result)
     return render_template("stage2.html",
                            stocks=[],
                            last_processed_time=None,
@@ -148,36 +137,37 @@ def stage2_process():
     if not os.path.exists(path):
         return render_template("stage2.html", error=f"⚠️ Source file not found: {path}")
 
+    job = submit_job("stage2", run_stage2_screener, "screener.stage2_view", path, "MCAPge250cr")
+    return redirect(url_for("jobs.job_page", job_id=job.id))
+
+# ⚙️ Stage 2 run (background job) - returns the stage2.html context
+def run_stage2_screener(path, source_name):
     df = pd.read_csv(path)
     symbols = [s + ".NS" for s in df["symbol"].dropna().unique()]
-    source_name = "MCAPge250cr"
 
     results = screen_stage2(symbols)
     delete_old_stage2_records()
 
-    presence_map = get_persistent_stage2_stocks()
+    stocks = results.to_dict(orient="records")
+    presence_map = get_persistence("stage2", [stock["symbol"] for stock in stocks])
     enriched = []
-    for stock in results.to_dict(orient="records"):
+    for stock in stocks:
         stock["symbol_clean"] = stock["symbol"].replace(".NS", "")
-        days = presence_map.get(stock["symbol"], 0)
+        presence = presence_map.get(stock["symbol"])
+        days = presence.days_present if presence else 0
         stock["persistence"] = f"{days} days"
-        stock["tag"] = (
-            "🔥 30D" if days >= 30 else
-            "📆 15D" if days >= 15 else
-            "🕒 7D" if days >= 7 else
-            "⏳ 3D" if days >= 3 else ""
-        )
+        stock["tag"] = persistence_tag(days)
         enriched.append(stock)
 
     last_processed_time = datetime.now().strftime("%d %b %Y %I:%M %p")
     updated, inserted = save_screened_stocks(results)
     summary_message = f"✅ Updated {updated} stocks, added {inserted} new"
 
-    return render_template("stage2.html", stocks=enriched,
-                           last_processed_time=last_processed_time,
-                           source_name=source_name,
-                           summary_message=summary_message,
-                           error=None)
+    return dict(stocks=enriched,
+                last_processed_time=last_processed_time,
+                source_name=source_name,
+                summary_message=summary_message,
+                error=None)
 
 # 📦 Saved stocks view
 @screener_bp.route("/stage2/saved")
@@ -195,23 +185,15 @@ def stage2_saved():
     # Fetch filtered stocks
     stocks = query.order_by(Stage2Stock.date.desc()).all()
 
-    # Count persistence
-    counts = db.session.query(
-        Stage2Stock.symbol,
-        func.count(Stage2Stock.date).label("days_present")
-    ).filter(Stage2Stock.date >= cutoff).group_by(Stage2Stock.symbol).all()
-    presence_map = {symbol: days for symbol, days in counts}
+    # Persistence for the listed symbols
+    presence_map = get_persistence("stage2", [stock.symbol for stock in stocks])
 
     # Enrich for display
     enriched = []
     for stock in stocks:
-        days = presence_map.get(stock.symbol, 0)
-        tag = (
-            "🔥 30D" if days >= 30 else
-            "📆 15D" if days >= 15 else
-            "🕒 7D" if days >= 7 else
-            "⏳ 3D" if days >= 3 else ""
-        )
+        presence = presence_map.get(stock.symbol)
+        days = presence.days_present if presence else 0
+        tag = persistence_tag(days)
         enriched.append({
             "date": stock.date,
             "symbol": stock.symbol,
@@ -232,6 +214,9 @@ def stage2_saved():
 # 📊 Sector analysis route
 @screener_bp.route("/sector-analysis", methods=["GET"])
 def sector_analysis_view():
+    result = job_result(request.args.get("job"), "sector_analysis")
+    if result:
+        return render_template("sector_analysis.html", **result)
     return render_template("sector_analysis.html",
                            sectors=[],
                            summary_message=None,
@@ -251,8 +236,16 @@ def sector_analysis_process():
     if "index_symbol" not in df.columns:
         return render_template("sector_analysis.html", error="⚠️ 'index_symbol' column missing in sector_list.csv", sectors=[])
 
+    job = submit_job("sector_analysis", run_sector_analysis, "screener.sector_analysis_view", path)
+    return redirect(url_for("jobs.job_page", job_id=job.id))
+
+# ⚙️ Sector analysis run (background job) - returns the sector_analysis.html context
+def run_sector_analysis(path):
+    df = pd.read_csv(path)
+
     results = []
-    for _, row in df.iterrows():
+    for i, (_, row) in enumerate(df.iterrows(), start=1):
+        report_progress(i, len(df))
         index_symbol = row["index_symbol"]
         if pd.isna(index_symbol) or not str(index_symbol).strip():
             continue
@@ -270,10 +263,9 @@ def sector_analysis_process():
 
     summary_message = f"✅ Sector analysis completed at {datetime.now().strftime('%d %b %Y %I:%M %p')}"
 
-    return render_template("sector_analysis.html",
-                           sectors=results,
-                           summary_message=summary_message,
-                           error=None)
+    return dict(sectors=results,
+                summary_message=summary_message,
+                error=None)
 
 # ✅ Validate sector files on startup
 def validate_sector_files(sector_csv_path="data/sector_list.csv", sector_dir="data/sectors"):
@@ -328,18 +320,15 @@ def sector_stocks(sector):
     if results.empty:
         return render_template("sector_stocks.html", error="⚠️ No valid Stage 2 stocks found for this sector.", sector=sector)
 
-    presence_map = get_persistent_stage2_stocks()
+    stocks = results.to_dict(orient="records")
+    presence_map = get_persistence("stage2", [stock["symbol"] for stock in stocks])
     enriched = []
-    for stock in results.to_dict(orient="records"):
+    for stock in stocks:
         stock["symbol_clean"] = stock["symbol"].replace(".NS", "")
-        days = presence_map.get(stock["symbol"], 0)
+        presence = presence_map.get(stock["symbol"])
+        days = presence.days_present if presence else 0
         stock["persistence"] = f"{days} days"
-        stock["tag"] = (
-            "🔥 30D" if days >= 30 else
-            "📆 15D" if days >= 15 else
-            "🕒 7D" if days >= 7 else
-            "⏳ 3D" if days >= 3 else ""
-        )
+        stock["tag"] = persistence_tag(days)
         enriched.append(stock)
 
     return render_template("sector_stocks.html", sector=sector, stocks=enriched)
@@ -1,8 +1,9 @@
-import yfinance as yf
 import pandas as pd
+from app.market_data import get_benchmark_weekly
+from app.bar_store import get_weekly_bars
 
 def fetch_weekly_data(symbol, weeks=60):
-    return yf.Ticker(symbol).history(period=f"{weeks}wk", interval="1wk")
+    return get_weekly_bars(symbol, weeks)
 
 def compute_relative_strength(sector_df, index_df):
     rs = sector_df["Close"] / index_df["Close"]
@@ -10,7 +11,7 @@ def compute_relative_strength(sector_df, index_df):
 
 def analyze_sector(index_symbol, benchmark="^NSEI"):
     sector_df = fetch_weekly_data(index_symbol)
-    index_df = fetch_weekly_data(benchmark)
+    index_df = get_benchmark_weekly(benchmark)
 
     if sector_df.empty or index_df.empty or len(sector_df) < 35:
         return None
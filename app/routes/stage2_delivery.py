@@ -2,9 +2,10 @@ from flask import Blueprint, render_template, request, flash
 from sqlalchemy import func
 from app.extensions import db
 from app.models import Stage2Stock, Stage2DeliveryStock
-import yfinance as yf
+from app.bar_store import get_bars
+from app.upsert import upsert_rows
+from app.persistence import get_persistence, persistence_tag, purge_screener_rows, record_screener_run
 from datetime import datetime, timedelta
-from sqlalchemy import and_
 
 stage2_delivery_bp = Blueprint("stage2_delivery", __name__)
 
@@ -24,8 +25,7 @@ def get_latest_stage2_symbols():
 
 def analyze_stage2_stock(symbol, benchmark_hist=None):
     try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period="30d")
+        hist = get_bars(symbol, days=30)
         if hist.empty or len(hist) < 22:
             return None
 
@@ -68,11 +68,10 @@ def stage2_delivery_screener_process():
     today = datetime.today().date()
 
     entries = get_latest_stage2_symbols()
-    benchmark_hist = yf.Ticker("^NSEI").history(period="30d")
+    benchmark_hist = get_bars("^NSEI", days=30)
 
     results = []
-    inserted_count = 0
-    updated_count = 0
+    rows = []
 
     for entry in entries:
         symbol = entry.symbol
@@ -90,41 +89,19 @@ def stage2_delivery_screener_process():
             data["symbol_clean"] = symbol.replace(".NS", "")
             results.append(data)
 
-            existing = Stage2DeliveryStock.query.filter(
-                and_(
-                    Stage2DeliveryStock.symbol == symbol,
-                    Stage2DeliveryStock.date == today
-                )
-            ).first()
-
-            if existing:
-                updated = False
-                for field, new_val in {
-                    "price": data["price"],
-                    "volume": data["volume"],
-                    "delivery_spike": data["delivery_spike"],
-                    "roc_21d": data["roc_21d"],
-                    "rs_vs_index_21d": data["rs_vs_index_21d"]
-                }.items():
-                    if getattr(existing, field) != new_val:
-                        setattr(existing, field, new_val)
-                        updated = True
-                if updated:
-                    db.session.add(existing)
-                    updated_count += 1
-            else:
-                db.session.add(Stage2DeliveryStock(
-                    symbol=symbol,
-                    date=today,
-                    price=data["price"],
-                    volume=data["volume"],
-                    delivery_spike=data["delivery_spike"],
-                    roc_21d=data["roc_21d"],
-                    rs_vs_index_21d=data["rs_vs_index_21d"]
-                ))
-                inserted_count += 1
-
-    db.session.commit()
+            rows.append({
+                "symbol": symbol,
+                "date": today,
+                "price": data["price"],
+                "volume": data["volume"],
+                "delivery_spike": data["delivery_spike"],
+                "roc_21d": data["roc_21d"],
+                "rs_vs_index_21d": data["rs_vs_index_21d"]
+            })
+
+    updated_count, inserted_count = upsert_rows(Stage2DeliveryStock, rows)
+    purge_screener_rows("stage2_delivery")
+    record_screener_run("stage2_delivery", [row["symbol"] for row in rows], today)
 
     if sort_by == "volume":
         results.sort(key=lambda x: x["volume"], reverse=True)
@@ -165,22 +142,13 @@ def stage2_delivery_history():
 
     stocks = query.order_by(Stage2DeliveryStock.date.desc()).all()
 
-    counts = db.session.query(
-        Stage2DeliveryStock.symbol,
-        db.func.count(Stage2DeliveryStock.date).label("days_present")
-    ).filter(Stage2DeliveryStock.date >= cutoff).group_by(Stage2DeliveryStock.symbol).all()
-
-    presence_map = {symbol: days for symbol, days in counts}
+    presence_map = get_persistence("stage2_delivery", [stock.symbol for stock in stocks])
 
     enriched = []
     for stock in stocks:
-        days = presence_map.get(stock.symbol, 0)
-        tag = (
-            "🔥 30D" if days >= 30 else
-            "📆 15D" if days >= 15 else
-            "🕒 7D" if days >= 7 else
-            "⏳ 3D" if days >= 3 else ""
-        )
+        presence = presence_map.get(stock.symbol)
+        days = presence.days_present if presence else 0
+        tag = persistence_tag(days)
         enriched.append({
             "date": stock.date,
             "symbol": stock.symbol,
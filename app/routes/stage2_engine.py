@@ -0,0 +1,90 @@
+# stage2_engine.py
+import numpy as np
+import pandas as pd
+
+# 🧠 Vectorized Stage 2 rules over a (week x symbol) panel
+#
+# Same rules as screener.evaluate_stage2(), computed for the whole universe at
+# once. Each symbol's valid weeks are first pushed to the bottom of its column
+# (what dropna() does per symbol), so the last row is every symbol's latest
+# bar and the rolling windows see the same rows as the per-symbol code.
+
+
+def _justify(values, valid):
+    """Move each column's valid rows to the bottom, keeping their order."""
+    rows, cols = values.shape
+    counts = valid.sum(axis=0)
+    target = (rows - counts)[None, :] + np.cumsum(valid, axis=0) - 1
+    columns = np.broadcast_to(np.arange(cols), values.shape)
+    out = np.full(values.shape, np.nan)
+    out[target[valid], columns[valid]] = values[valid]
+    return out, counts
+
+
+def _rolling_mean(values, window):
+    return pd.DataFrame(values).rolling(window=window).mean().to_numpy()
+
+
+def rank_stage2(df):
+    """Sort passing symbols by relative strength and number them."""
+    if df.empty or "rs" not in df.columns or df["rs"].isnull().all():
+        return pd.DataFrame()
+    df = df[df["rs"].notnull()].sort_values(by="rs", ascending=False, kind="stable")
+    df = df.reset_index(drop=True)
+    df["rank"] = df.index + 1
+    return df
+
+
+def screen_stage2_panel(close, volume, index_close, min_weeks=35):
+    """
+    close/volume: weekly DataFrames indexed by week, one column per symbol.
+    index_close: benchmark weekly closes. Returns the ranked Stage 2 DataFrame.
+    """
+    if close.empty:
+        return pd.DataFrame()
+
+    # yf.download and history() disagree on timezones; the store keeps naive dates
+    if close.index.tz is not None:
+        close = close.tz_localize(None)
+        volume = volume.tz_localize(None)
+    if index_close.index.tz is not None:
+        index_close = index_close.tz_localize(None)
+    close = close.sort_index()
+    volume = volume.reindex(index=close.index, columns=close.columns)
+    bench = index_close.reindex(close.index).to_numpy(dtype=float)
+
+    c = close.to_numpy(dtype=float)
+    v = volume.to_numpy(dtype=float)
+    valid = ~np.isnan(c) & ~np.isnan(v)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = c / bench[:, None]
+
+    c, counts = _justify(c, valid)
+    v, _ = _justify(v, valid)
+    ratio, _ = _justify(ratio, valid)
+    if len(c) < 2:
+        return pd.DataFrame()
+
+    ma_30w = _rolling_mean(c, 30)
+    vol_avg = _rolling_mean(v, 10)
+    rs = _rolling_mean(ratio, 10)
+
+    with np.errstate(invalid="ignore"):
+        passed = (
+            (counts >= min_weeks) &
+            (c[-1] > ma_30w[-1]) &
+            (ma_30w[-1] > ma_30w[-2]) &
+            (v[-1] > vol_avg[-1]) &
+            (rs[-1] > rs[-2])
+        )
+
+    hits = np.flatnonzero(passed)
+    df = pd.DataFrame({
+        "symbol": close.columns[hits],
+        "price": np.round(c[-1, hits], 2),
+        "30w_ma": np.round(ma_30w[-1, hits], 2),
+        "volume": v[-1, hits].astype(np.int64),
+        "vol_avg": vol_avg[-1, hits].astype(np.int64),
+        "rs": np.round(rs[-1, hits], 2),
+    })
+    return rank_stage2(df)
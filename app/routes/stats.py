@@ -1,141 +1,121 @@
 from flask import Blueprint, render_template, request, redirect, url_for
 from flask_login import login_required, current_user
-from datetime import date, datetime, timedelta
-from collections import defaultdict
-from app.models import Trade, TradeEntry, TradeExit
+from datetime import datetime
+from sqlalchemy import and_, case, func
+from app.models import Trade, TradeEntry
+from app.extensions import db
+from app.daily_pnl import get_daily_pnl
+from app.trade_query import TRADE_PNL, range_window, trade_filters
 from app import cache
+from app.user_cache import bump_cache_generation, cache_lookup, etag_by_data_version, user_cache_key
 
-from app.routes.stats_helpers import (
-    calculate_realized_pnl, is_win, holding_days,
-    get_equity_curve, get_stock_stats
-)
+from app.routes.stats_helpers import equity_curve_from_points, pnl_buckets, rank_stock_stats
 
 
 
 stats_bp = Blueprint('stats', __name__, template_folder='../templates')
+
+STATS_CACHE_TIMEOUT = 6 * 60 * 60  # keys carry the user's cache generation, trade writes invalidate them
+
+# 📅 Whole days between two DATE columns
+def _days_between(start, end):
+    if db.session.get_bind().dialect.name == "sqlite":
+        return func.julianday(end) - func.julianday(start)
+    return end - start  # PostgreSQL: date - date is an integer day count
+
 #stats Route
 @stats_bp.route('/')
 @login_required
+@etag_by_data_version("trades")
 def stats_dashboard():
     filter_range = request.args.get('range', 'all_time')
-    cache_key = f"stats:{current_user.id}:{filter_range}"
-    cached_data = cache.get(cache_key)
+    cache_key = user_cache_key("stats", current_user.id, filter_range)
+    cached_data = cache_lookup("stats", cache_key)
     if cached_data:
         return render_template('stats_dashboard.html', **cached_data)
 
-    today = date.today()
-    if filter_range == 'last_7_days':
-        start_date = today - timedelta(days=7)
-    elif filter_range == 'last_30_days':
-        start_date = today - timedelta(days=30)
-    elif filter_range == 'last_90_days':
-        start_date = today - timedelta(days=90)
-    elif filter_range == 'ytd':
-        start_date = date(today.year, 1, 1)
-    elif filter_range == 'last_year':
-        start_date = date(today.year - 1, 1, 1)
-        end_date = date(today.year - 1, 12, 31)
-    else:
-        start_date = None
-
-    trades = Trade.query.filter_by(user_id=current_user.id).all()
-    if start_date:
-        trades = [
-            t for t in trades
-            if (
-                (t.status == "Closed" and t.exit_date and t.exit_date >= start_date) or
-                (t.status == "Open" and t.entry_date and t.entry_date >= start_date)
-            )
-        ]
-
-    if filter_range == 'last_year':
-        trades = [
-            t for t in trades
-            if (
-                (t.status == "Closed" and t.exit_date and start_date <= t.exit_date <= end_date) or
-                (t.status == "Open" and t.entry_date and start_date <= t.entry_date <= end_date)
-            )
-        ]
-
-    closed_trades = [t for t in trades if t.status == "Closed"]
-    open_trades = [t for t in trades if t.status == "Open"]
-    win_trades = [t for t in closed_trades if is_win(t)]
-    loss_trades = [t for t in closed_trades if not is_win(t)]
-
-    realized_pnl = sum(calculate_realized_pnl(t) for t in closed_trades)
-    win_rate = round((len(win_trades) / len(closed_trades)) * 100, 2) if closed_trades else 0
-    expectancy = round(realized_pnl / len(closed_trades), 2) if closed_trades else 0
-    gross_profit = sum(calculate_realized_pnl(t) for t in win_trades)
-    gross_loss = sum(calculate_realized_pnl(t) for t in loss_trades)
+    start_date, end_date = range_window(filter_range)
+    user_trades = trade_filters(current_user.id, filter_range)
+    closed_trades = trade_filters(current_user.id, filter_range, status="Closed")
+
+    # 🧮 Headline numbers in one conditional-aggregate query
+    pnl = TRADE_PNL
+    is_closed = Trade.status == "Closed"
+    won = and_(is_closed, pnl > 0)
+    lost = and_(is_closed, pnl <= 0)
+    hold = func.coalesce(_days_between(Trade.entry_date, Trade.exit_date), 0)
+
+    (trade_count, open_count, closed_count, win_count, realized_pnl, gross_profit, gross_loss,
+     win_hold_days, loss_hold_days, bought_qty) = db.session.query(
+        func.count(Trade.id),
+        func.coalesce(func.sum(case((Trade.status == "Open", 1), else_=0)), 0),
+        func.coalesce(func.sum(case((is_closed, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((won, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((is_closed, pnl), else_=0)), 0),
+        func.coalesce(func.sum(case((won, pnl), else_=0)), 0),
+        func.coalesce(func.sum(case((lost, pnl), else_=0)), 0),
+        func.coalesce(func.sum(case((won, hold), else_=0)), 0),
+        func.coalesce(func.sum(case((lost, hold), else_=0)), 0),
+        func.coalesce(func.sum(Trade.total_buy_qty), 0),
+    ).filter(*user_trades).one()
+    loss_count = closed_count - win_count
+
+    entry_count = db.session.query(func.count(TradeEntry.id)) \
+        .join(Trade, TradeEntry.trade_id == Trade.id).filter(*user_trades).scalar()
+
+    win_rate = round((win_count / closed_count) * 100, 2) if closed_count else 0
+    expectancy = round(realized_pnl / closed_count, 2) if closed_count else 0
     profit_factor = round(gross_profit / abs(gross_loss), 2) if gross_loss else 0
-    avg_win_hold = round(sum(holding_days(t) for t in win_trades) / len(win_trades), 1) if win_trades else 0
-    avg_loss_hold = round(sum(holding_days(t) for t in loss_trades) / len(loss_trades), 1) if loss_trades else 0
-    avg_win = round(sum(calculate_realized_pnl(t) for t in win_trades) / len(win_trades), 2) if win_trades else 0
-    avg_loss = round(sum(calculate_realized_pnl(t) for t in loss_trades) / len(loss_trades), 2) if loss_trades else 0
-
-    win_streak = loss_streak = 0
-    current_streak = 0
-    last_was_win = None
-    for t in closed_trades:
-        result = is_win(t)
-        if result == last_was_win:
-            current_streak += 1
-        else:
-            current_streak = 1
-        last_was_win = result
-        if result:
-            win_streak = max(win_streak, current_streak)
-        else:
-            loss_streak = max(loss_streak, current_streak)
-
-    total_entries = [e for t in trades for e in t.entries]
-    avg_daily_vol = round(sum(e.quantity for e in total_entries) / len(trades), 1) if trades else 0
-    avg_size = round(sum(e.quantity for e in total_entries) / len(total_entries), 1) if total_entries else 0
-    equity_curve, max_drawdown = get_equity_curve(closed_trades)
-    most_traded_stats, most_profitable_stats = get_stock_stats(closed_trades, limit=20) # Most Traded and Most Profitable stocks
-
-    # 📊 Prepare Profit/Loss Bar Chart Data
-    daily_pnl = defaultdict(float)
-
-    for t in closed_trades:
-        if t.exit_date and calculate_realized_pnl(t) != 0:
-            date_label = t.exit_date.strftime("%d-%b-%Y")  # e.g., "Apr-05"= %Y-%b-%d
-            daily_pnl[date_label] += calculate_realized_pnl(t)
-
-    # Convert to sorted list of bars
-    sorted_days = sorted(daily_pnl.items(), key=lambda x: datetime.strptime(x[0], "%d-%b-%Y"))
-    trade_bars = [{"date": label, "pnl": round(pnl, 2)} for label, pnl in sorted_days[-10:]]
-    
-    # 📊 Weekly Profit/Loss Bar Chart Data
-    weekly_pnl = defaultdict(float)
-
-    for t in closed_trades:
-        if t.exit_date and calculate_realized_pnl(t) != 0:
-            week_start = t.exit_date - timedelta(days=t.exit_date.weekday())  # Monday of the week
-            week_label = week_start.strftime("Week of %d %b")  # e.g., "Week of Oct 06"
-            weekly_pnl[week_label] += calculate_realized_pnl(t)
-
-    # Sort by week and keep last 10
-    sorted_weeks = sorted(weekly_pnl.items(), key=lambda x: datetime.strptime(x[0], "Week of %d %b"))
-    weekly_bars = [{"week": label, "pnl": round(pnl, 2)} for label, pnl in sorted_weeks[-10:]]
-
-    # 📊 Monthly Profit/Loss Bar Chart Data
-    monthly_pnl = defaultdict(float)
-
-    for t in closed_trades:
-        if t.exit_date and calculate_realized_pnl(t) != 0:
-            month_label = t.exit_date.strftime("%Y-%m")  # e.g., "2025-10"
-            monthly_pnl[month_label] += calculate_realized_pnl(t)
-
-    # Sort by month and keep last 12
-    sorted_months = sorted(monthly_pnl.items(), key=lambda x: datetime.strptime(x[0], "%Y-%m"))
-    monthly_bars = [{"month": datetime.strptime(label, "%Y-%m").strftime("%b %Y"), "pnl": round(pnl, 2)} for label, pnl in sorted_months[-12:]]
-
+    avg_win_hold = round(win_hold_days / win_count, 1) if win_count else 0
+    avg_loss_hold = round(loss_hold_days / loss_count, 1) if loss_count else 0
+    avg_win = round(gross_profit / win_count, 2) if win_count else 0
+    avg_loss = round(gross_loss / loss_count, 2) if loss_count else 0
+    avg_daily_vol = round(bought_qty / trade_count, 1) if trade_count else 0
+    avg_size = round(bought_qty / entry_count, 1) if entry_count else 0
+
+    # 🔁 Longest win / loss runs (gaps-and-islands over closed trades in id order)
+    outcomes = db.session.query(Trade.id.label("id"), case((pnl > 0, 1), else_=0).label("win")) \
+        .filter(*closed_trades).subquery()
+    runs = db.session.query(
+        outcomes.c.win,
+        (func.row_number().over(order_by=outcomes.c.id) -
+         func.row_number().over(partition_by=outcomes.c.win, order_by=outcomes.c.id)).label("run"),
+    ).subquery()
+    run_lengths = db.session.query(runs.c.win, func.count().label("length")) \
+        .group_by(runs.c.win, runs.c.run).subquery()
+    streaks = dict(db.session.query(run_lengths.c.win, func.max(run_lengths.c.length))
+                   .group_by(run_lengths.c.win).all())
+    win_streak = streaks.get(1, 0)
+    loss_streak = streaks.get(0, 0)
+
+    # 📈 Equity curve and P&L bars from the daily rollup (one row per exit date)
+    days = get_daily_pnl(current_user.id, start_date, end_date)
+    equity_curve, max_drawdown = equity_curve_from_points((d, day_pnl) for d, day_pnl, _, _ in days)
+
+    # 🏷 Most traded / most profitable stocks (first-traded order breaks ties, as before)
+    stock = func.upper(Trade.stock_name)
+    stock_rows = db.session.query(stock, func.count(Trade.id), func.sum(pnl)) \
+        .filter(*closed_trades).group_by(stock).order_by(func.min(Trade.id)).all()
+    most_traded_stats, most_profitable_stats = rank_stock_stats(
+        {name: {'count': count, 'pnl': total} for name, count, total in stock_rows}, limit=20
+    )
+
+    # 📊 Daily / weekly / monthly P&L bars over days with at least one non-zero trade
+    bar_days = [(d, day_pnl) for d, day_pnl, profit, loss in days if profit or loss]
+    bar_dates = [d for d, _ in bar_days]
+    bar_pnl = [day_pnl for _, day_pnl in bar_days]
+
+    trade_bars = [{"date": d.strftime("%d-%b-%Y"), "pnl": round(total, 2)}
+                  for d, total in pnl_buckets(bar_dates, bar_pnl, 'day')[-10:]]
+    weekly_bars = [{"week": d.strftime("Week of %d %b"), "pnl": round(total, 2)}
+                   for d, total in pnl_buckets(bar_dates, bar_pnl, 'week')[-10:]]
+    monthly_bars = [{"month": d.strftime("%b %Y"), "pnl": round(total, 2)}
+                    for d, total in pnl_buckets(bar_dates, bar_pnl, 'month')[-12:]]
 
     context = {
         'realized_pnl': realized_pnl,
-        'open_trades': len(open_trades),
-        'closed_trades': len(closed_trades),
+        'open_trades': open_count,
+        'closed_trades': closed_count,
         'win_rate': win_rate,
         'expectancy': expectancy,
         'profit_factor': profit_factor,
@@ -157,7 +137,7 @@ def stats_dashboard():
         'last_computed': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
 
-    cache.set(cache_key, context, timeout=300)  # Cache for 5 minutes
+    cache.set(cache_key, context, timeout=STATS_CACHE_TIMEOUT)
     return render_template('stats_dashboard.html', **context)
 
 
@@ -165,6 +145,5 @@ def stats_dashboard():
 @login_required
 def refresh_stats():
     filter_range = request.args.get('range', 'all_time')
-    cache_key = f"stats:{current_user.id}:{filter_range}"
-    cache.delete(cache_key)
+    bump_cache_generation(current_user.id)  # drops every range, not just this one
     return redirect(url_for('stats.stats_dashboard', range=filter_range))
@@ -1,7 +1,8 @@
 # stats_helpers.py
+import numpy as np
 
 def calculate_realized_pnl(trade):
-    return sum(x.quantity * x.price for x in trade.exits) - sum(e.quantity * e.price for e in trade.entries)
+    return trade.exited_amount - trade.invested_amount
 
 def is_win(trade):
     return calculate_realized_pnl(trade) > 0
@@ -11,30 +12,131 @@ def holding_days(trade):
         return (trade.exit_date - trade.entry_date).days
     return 0
 
+class TradeMetrics:
+    """One trade's numbers, computed once per request (no ORM object, no entry/exit walk)."""
+    __slots__ = ('stock', 'entry_date', 'exit_date', 'status', 'pnl', 'is_win', 'hold_days', 'quantity')
+
+    def __init__(self, stock, entry_date, exit_date, status, pnl, quantity):
+        self.stock = stock
+        self.entry_date = entry_date
+        self.exit_date = exit_date
+        self.status = status
+        self.pnl = pnl
+        self.is_win = pnl > 0
+        self.hold_days = (exit_date - entry_date).days if entry_date and exit_date else 0
+        self.quantity = quantity
+
+# 🧮 Metrics kernel - plain arrays in (P&L, exit dates, hold days), numbers out
+
+def equity_and_drawdown(pnl):
+    """Running equity (np.cumsum) and the largest drop from a running peak that starts at 0."""
+    pnl = np.asarray(pnl, dtype=float)
+    equity = np.cumsum(pnl)
+    if not len(equity):
+        return equity, 0
+    peak = np.maximum.accumulate(np.maximum(equity, 0))
+    return equity, float((peak - equity).max())
+
+def longest_streaks(pnl):
+    """(longest win run, longest loss run) by run-length encoding; P&L <= 0 counts as a loss."""
+    wins = np.asarray(pnl, dtype=float) > 0
+    if not len(wins):
+        return 0, 0
+    starts = np.r_[0, np.flatnonzero(wins[1:] != wins[:-1]) + 1]
+    lengths = np.diff(np.r_[starts, len(wins)])
+    won = wins[starts]
+    return int(lengths[won].max(initial=0)), int(lengths[~won].max(initial=0))
+
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+def date_array(dates):
+    """datetime64[D] array from date objects (toordinal is ~10x faster than numpy's own conversion)."""
+    if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype('datetime64[D]')
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64)
+    return (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+
+def _period_ordinals(exit_dates, period):
+    days = date_array(exit_dates)
+    if period == 'day':
+        return days.astype(np.int64)
+    if period == 'week':
+        day_numbers = days.astype(np.int64)
+        return day_numbers - (day_numbers + 3) % 7  # Monday of the week (1970-01-01 was a Thursday)
+    if period == 'month':
+        return days.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Unknown period: {period}")
+
+def pnl_buckets(exit_dates, pnl, period='day'):
+    """Sum P&L per day / week (Monday) / month -> [(period start date, total)] oldest first."""
+    if not len(pnl):
+        return []
+    ordinals = _period_ordinals(exit_dates, period)
+    offset = ordinals.min()
+    totals = np.bincount(ordinals - offset, weights=np.asarray(pnl, dtype=float))
+    counts = np.bincount(ordinals - offset)
+    used = np.flatnonzero(counts)
+    unit = 'M' if period == 'month' else 'D'
+    starts = (used + offset).astype(f'datetime64[{unit}]').astype('datetime64[D]').astype(object)
+    return list(zip(starts, totals[used].tolist()))
+
+def trade_metrics(pnl, hold_days=None):
+    """Summary numbers for closed trades (P&L in exit order)."""
+    pnl = np.asarray(pnl, dtype=float)
+    wins = pnl > 0
+    win_count = int(wins.sum())
+    loss_count = len(pnl) - win_count
+    realized_pnl = float(pnl.sum())
+    gross_profit = float(pnl[wins].sum())
+    gross_loss = float(pnl[~wins].sum())
+    _, max_drawdown = equity_and_drawdown(pnl)
+    win_streak, loss_streak = longest_streaks(pnl)
+
+    metrics = {
+        'realized_pnl': realized_pnl,
+        'win_rate': round((win_count / len(pnl)) * 100, 2) if len(pnl) else 0,
+        'expectancy': round(realized_pnl / len(pnl), 2) if len(pnl) else 0,
+        'profit_factor': round(gross_profit / abs(gross_loss), 2) if gross_loss else 0,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'avg_win': round(gross_profit / win_count, 2) if win_count else 0,
+        'avg_loss': round(gross_loss / loss_count, 2) if loss_count else 0,
+        'max_drawdown': max_drawdown,
+        'win_streak': win_streak,
+        'loss_streak': loss_streak,
+    }
+    if hold_days is not None:
+        hold_days = np.asarray(hold_days, dtype=float)
+        metrics['avg_win_hold'] = round(float(hold_days[wins].mean()), 1) if win_count else 0
+        metrics['avg_loss_hold'] = round(float(hold_days[~wins].mean()), 1) if loss_count else 0
+    return metrics
+
 def get_equity_curve(trades):
-    equity = 0
-    peak = 0
-    max_drawdown = 0
-    curve = []
-    for t in sorted(trades, key=lambda x: x.exit_date):
-        pnl = calculate_realized_pnl(t)
-        equity += pnl
-        peak = max(peak, equity)
-        drawdown = peak - equity
-        max_drawdown = max(max_drawdown, drawdown)
-        curve.append({'date': t.exit_date.strftime('%d-%m-%Y'), 'value': equity})
+    closed = sorted(trades, key=lambda x: x.exit_date)
+    return equity_curve_from_points((t.exit_date, calculate_realized_pnl(t)) for t in closed)
+
+def equity_curve_from_points(points):
+    """points: (exit_date, pnl) in exit-date order -> (curve, max_drawdown)."""
+    points = list(points)
+    equity, max_drawdown = equity_and_drawdown([pnl for _, pnl in points])
+    curve = [{'date': exit_date.strftime('%d-%m-%Y'), 'value': value}
+             for (exit_date, _), value in zip(points, equity.tolist())]
     return curve, max_drawdown
 
 def get_stock_stats(trades, limit=20):
-    stats = {}
-    for t in trades:
-        pnl = calculate_realized_pnl(t)
-        stock = t.stock_name.upper()
-        if stock not in stats:
-            stats[stock] = {'count': 0, 'pnl': 0}
-        stats[stock]['count'] += 1
-        stats[stock]['pnl'] += pnl
+    names = np.array([t.stock_name.upper() for t in trades], dtype=object)
+    pnl = np.array([calculate_realized_pnl(t) for t in trades], dtype=float)
+    if not len(names):
+        return {}, {}
+    stocks, first_index, inverse = np.unique(names, return_index=True, return_inverse=True)
+    counts = np.bincount(inverse)
+    totals = np.bincount(inverse, weights=pnl)
+    order = np.argsort(first_index, kind='stable')  # first-traded order, as the ranking expects
+    stats = {stocks[i]: {'count': int(counts[i]), 'pnl': float(totals[i])} for i in order}
+    return rank_stock_stats(stats, limit)
 
+def rank_stock_stats(stats, limit=20):
+    """stats: {stock: {'count', 'pnl'}} in first-traded order."""
     # Sort by trade count (most traded)
     most_traded = dict(sorted(stats.items(), key=lambda x: x[1]['count'], reverse=True)[:limit])
 
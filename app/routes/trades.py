@@ -1,10 +1,14 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from app.models import Trade, TradeEntry, TradeExit
-from app.extensions import db
-from datetime import date, datetime, timedelta
-import pandas as pd
-from io import BytesIO
+from app.extensions import db, cache
+from app.daily_pnl import refresh_daily_pnl
+from app.user_cache import bump_cache_generation, cache_lookup, etag_by_data_version, user_cache_key
+from app.streaming_export import csv_response, xlsx_response
+from app.trade_query import TRADE_PNL, trade_query
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
+from datetime import date, datetime
 from flask_wtf.csrf import validate_csrf, CSRFError  # ✅ CSRF validation
 
 trades_bp = Blueprint('trades', __name__)
@@ -14,7 +18,9 @@ trades_bp = Blueprint('trades', __name__)
 @login_required
 def dashboard():
     strategy_filter = request.args.get('strategy_tag')
-    query = Trade.query.filter_by(user_id=current_user.id)
+    # Only open trades are listed; entries/exits come in two batched queries
+    query = Trade.query.filter_by(user_id=current_user.id, status='Open') \
+        .options(selectinload(Trade.entries), selectinload(Trade.exits))
 
     if strategy_filter:
         query = query.filter(Trade.strategy_tag == strategy_filter)
@@ -26,22 +32,22 @@ def dashboard():
     open_trade_count = 0  # ✅ Open trades count for starting no data app
 
     for trade in trades:
-        if trade.status != "Open" or not trade.entries:
+        if not trade.total_buy_qty:
             continue
 
-        total_invested = sum(float(e.invested_amount) for e in trade.entries)
-        total_quantity = sum(e.quantity for e in trade.entries)
-        exited_quantity = sum(x.quantity for x in trade.exits)
+        total_invested = trade.invested_amount
+        total_quantity = trade.total_buy_qty
+        exited_quantity = trade.total_sell_qty
         remaining_quantity = total_quantity - exited_quantity
         open_trade_count = len(trade_data)
 
         if total_quantity == 0 or remaining_quantity == 0:
             continue
 
-        avg_entry_price = round(total_invested / total_quantity, 2)
+        avg_entry_price = round(trade.avg_entry_price, 2)
         invested_remaining = round((remaining_quantity / total_quantity) * total_invested, 2)
-        realized_pnl = sum((exit.price - avg_entry_price) * exit.quantity for exit in trade.exits)
-        realized_profit = sum((x.price - avg_entry_price) * x.quantity for x in trade.exits)
+        realized_pnl = trade.exited_amount - avg_entry_price * exited_quantity
+        realized_profit = realized_pnl
 
         first_entry = trade.entries[0]
         entry_date = first_entry.date.strftime('%d/%m/%y')
@@ -106,6 +112,7 @@ def add_trade():
             new_trade = Trade(stock_name=stock_name, entry_note=entry_note, user_id=current_user.id, strategy_tag=strategy_tag)
             db.session.add(new_trade)
             db.session.commit()
+            bump_cache_generation(current_user.id)
             flash(f"Trade for {stock_name} created successfully.", "success")
             return redirect(url_for('trades.view_trade', trade_id=new_trade.id))
         except Exception as e:
@@ -128,13 +135,8 @@ def view_trade(trade_id):
     entries = TradeEntry.query.filter_by(trade_id=trade.id).order_by(TradeEntry.date).all()
     exits = TradeExit.query.filter_by(trade_id=trade.id).order_by(TradeExit.date).all()
 
-    total_invested = sum(e.invested_amount for e in entries)
-    total_exited = sum(x.exit_amount for x in exits)
-    total_buy_qty = sum(e.quantity for e in entries)
-    total_sell_qty = sum(x.quantity for x in exits)
-
-    status = "Closed" if total_buy_qty == total_sell_qty else "Open"
-    pnl = total_exited - total_invested if status == "Closed" else None
+    status = "Closed" if trade.total_buy_qty == trade.total_sell_qty else "Open"
+    pnl = trade.exited_amount - trade.invested_amount if status == "Closed" else None
 
     if entries:
         start_date = entries[0].date
@@ -173,8 +175,8 @@ def add_entry(trade_id):
         date_obj = date.fromisoformat(date_str)
         note = request.form.get('note', '').strip()
 
-        total_buy_qty = sum(e.quantity for e in trade.entries)
-        total_sell_qty = sum(x.quantity for x in trade.exits)
+        total_buy_qty = trade.total_buy_qty
+        total_sell_qty = trade.total_sell_qty
 
         if total_buy_qty == total_sell_qty and total_buy_qty > 0:
             flash("Trade is closed. Start a new trade to buy again.", "error")
@@ -196,7 +198,10 @@ def add_entry(trade_id):
         if not trade.entry_date:
             trade.entry_date = date_obj
 
+        trade.refresh_totals()
+        refresh_daily_pnl(trade.user_id, {trade.exit_date})
         db.session.commit()
+        bump_cache_generation(current_user.id)
         flash("Buy entry added successfully.", "success")
 
     except CSRFError:
@@ -226,8 +231,8 @@ def add_exit(trade_id):
         date_obj = date.fromisoformat(date_str)
         note = request.form.get('note', '').strip()
 
-        total_buy_qty = sum(e.quantity for e in trade.entries)
-        total_sell_qty = sum(x.quantity for x in trade.exits)
+        total_buy_qty = trade.total_buy_qty
+        total_sell_qty = trade.total_sell_qty
         available_qty = total_buy_qty - total_sell_qty
 
         if quantity > available_qty:
@@ -249,7 +254,10 @@ def add_exit(trade_id):
             trade.status = "Closed"
             trade.exit_date = max([x.date for x in trade.exits] + [date_obj])  # Include new exit date
 
+        trade.refresh_totals()
+        refresh_daily_pnl(trade.user_id, {trade.exit_date})
         db.session.commit()
+        bump_cache_generation(current_user.id)
         flash("Sell exit added successfully.", "success")
 
     except CSRFError:
@@ -284,7 +292,10 @@ def edit_entry(entry_id):
             entry.price = price
             entry.date = date_obj
             entry.note = note
+            trade.refresh_totals()
+            refresh_daily_pnl(trade.user_id, {trade.exit_date})
             db.session.commit()
+            bump_cache_generation(current_user.id)
             flash("Buy entry updated successfully.", "success")
             return redirect(url_for('trades.view_trade', trade_id=trade.id))
         except CSRFError:
@@ -309,7 +320,10 @@ def delete_entry(entry_id):
     try:
         validate_csrf(request.form.get('csrf_token'))  # ✅ CSRF check
         db.session.delete(entry)
+        trade.refresh_totals()
+        refresh_daily_pnl(trade.user_id, {trade.exit_date})
         db.session.commit()
+        bump_cache_generation(current_user.id)
         flash("Buy entry deleted successfully.", "success")
     except CSRFError:
         flash("Invalid or missing CSRF token.", "error")
@@ -339,8 +353,8 @@ def edit_exit(exit_id):
             note = request.form.get('note', '').strip()
             date_obj = date.fromisoformat(date_str)
 
-            total_buy_qty = sum(e.quantity for e in trade.entries)
-            other_exits_qty = sum(x.quantity for x in trade.exits if x.id != exit.id)
+            total_buy_qty = trade.total_buy_qty
+            other_exits_qty = trade.total_sell_qty - exit.quantity
             available_qty = total_buy_qty - other_exits_qty
 
             if quantity > available_qty:
@@ -351,7 +365,10 @@ def edit_exit(exit_id):
             exit.price = price
             exit.date = date_obj
             exit.note = note
+            trade.refresh_totals()
+            refresh_daily_pnl(trade.user_id, {trade.exit_date})
             db.session.commit()
+            bump_cache_generation(current_user.id)
             flash("Sell exit updated successfully.", "success")
             return redirect(url_for('trades.view_trade', trade_id=trade.id))
         except CSRFError:
@@ -376,7 +393,10 @@ def delete_exit(exit_id):
     try:
         validate_csrf(request.form.get('csrf_token'))  # ✅ CSRF check
         db.session.delete(exit)
+        trade.refresh_totals()
+        refresh_daily_pnl(trade.user_id, {trade.exit_date})
         db.session.commit()
+        bump_cache_generation(current_user.id)
         flash("Sell exit deleted successfully.", "success")
     except CSRFError:
         flash("Invalid or missing CSRF token.", "error")
@@ -405,13 +425,16 @@ def edit_trade(trade_id):
             journal = request.form.get('journal', '').strip()
             strategy_tag = request.form.get('strategy_tag', '').strip()
 
+            old_exit_date = trade.exit_date
             trade.stock_name = stock_name
             trade.entry_date = date.fromisoformat(entry_date_str) if entry_date_str else None
             trade.exit_date = date.fromisoformat(exit_date_str) if exit_date_str else None
             trade.journal = journal
             trade.strategy_tag = strategy_tag   # ✅ NEW Tag
 
+            refresh_daily_pnl(trade.user_id, {old_exit_date, trade.exit_date})
             db.session.commit()
+            bump_cache_generation(current_user.id)
             flash("Trade updated successfully.", "success")
             return redirect(url_for('trades.dashboard'))
 
@@ -435,8 +458,11 @@ def delete_trade(trade_id):
 
     try:
         validate_csrf(request.form.get('csrf_token'))  # ✅ CSRF check
+        user_id, exit_date = trade.user_id, trade.exit_date
         db.session.delete(trade)
+        refresh_daily_pnl(user_id, {exit_date})
         db.session.commit()
+        bump_cache_generation(current_user.id)
         flash("Trade deleted successfully.", "success")
     except CSRFError:
         flash("Invalid or missing CSRF token.", "error")
@@ -448,154 +474,157 @@ def delete_trade(trade_id):
 
 #=======
 #trade_history() Route
+HISTORY_PAGE_SIZES = (20, 50, 100)
+STOCK_LIST_CACHE_TIMEOUT = 6 * 60 * 60
+
+HISTORY_RANGE_ALIASES = {'last_year': 'last_12_months'}  # older links: history's "Last Year" is rolling
+
+def _history_filters(args):
+    page_size = args.get('page_size', type=int)
+    date_range = args.get('date_range')
+    return {
+        'stock': args.get('stock', '').upper(),
+        'date_range': HISTORY_RANGE_ALIASES.get(date_range, date_range),
+        'sort': 'asc' if args.get('sort') == 'asc' else 'desc',
+        'strategy_tag': args.get('strategy_tag'),
+        'page_size': page_size if page_size in HISTORY_PAGE_SIZES else HISTORY_PAGE_SIZES[0],
+    }
+
+def _parse_cursor(cursor):
+    """'<pnl>:<id>' of the last row shown -> (pnl, id), or None for the first page."""
+    try:
+        pnl, trade_id = cursor.rsplit(':', 1)
+        return float(pnl), int(trade_id)
+    except (AttributeError, ValueError):
+        return None
+
+# 🔎 Closed trades matching the history filters, ordered by (realized P&L, id) in SQL
+def _history_query(user_id, filters, position=None):
+    pnl = TRADE_PNL
+    query = trade_query(user_id, range_name=filters['date_range'], stock=filters['stock'],
+                        strategy_tag=filters['strategy_tag'], status='Closed', eager=True)
+
+    if filters['sort'] == 'asc':
+        if position:
+            query = query.filter(tuple_(pnl, Trade.id) > tuple_(*position))
+        query = query.order_by(pnl.asc(), Trade.id.asc())
+    else:
+        if position:
+            query = query.filter(tuple_(pnl, Trade.id) < tuple_(*position))
+        query = query.order_by(pnl.desc(), Trade.id.desc())
+    return query
+
+def _history_row(trade):
+    total_quantity = trade.total_buy_qty
+    total_invested = trade.invested_amount
+    avg_entry_price = round(total_invested / total_quantity, 2) if total_quantity else 0
+
+    total_exited = trade.exited_amount
+    avg_exit_price = round(total_exited / total_quantity, 2) if total_quantity else 0
+
+    realized_pnl = round(total_exited - total_invested, 2)
+    total_days = (trade.exit_date - trade.entry_date).days if trade.entry_date and trade.exit_date else 0
+    return_pct = round((realized_pnl / total_invested) * 100, 2) if total_invested else 0
+
+    entry_notes = [e.note for e in trade.entries if e.note]
+    exit_notes = [x.note for x in trade.exits if x.note]
+    combined_notes = " | ".join(entry_notes + exit_notes)
+
+    return {
+        'id': trade.id,  # ✅ Add this line to fetch trade.id in view button
+        'stock_name': trade.stock_name.upper(),
+        'entry_date': trade.entry_date,
+        'exit_date': trade.exit_date,
+        'avg_entry_price': avg_entry_price,
+        'avg_exit_price': avg_exit_price,
+        'total_quantity': total_quantity,
+        'total_invested': round(total_invested, 2),
+        'realized_pnl': realized_pnl,
+        'return_pct': return_pct,
+        'total_days': total_days,
+        'notes': combined_notes,
+        'strategy_tag': trade.strategy_tag
+    }
+
+# 📄 One page of closed trades, continued by keyset from the cursor
+def _history_page(user_id, filters, cursor=None):
+    # One extra row tells us whether there is a next page
+    trades = _history_query(user_id, filters, _parse_cursor(cursor)).limit(filters['page_size'] + 1).all()
+    has_more = len(trades) > filters['page_size']
+    trades = trades[:filters['page_size']]
+
+    last = trades[-1] if trades else None
+    next_cursor = f"{last.exited_amount - last.invested_amount!r}:{last.id}" if has_more else None
+    return [_history_row(trade) for trade in trades], next_cursor
+
+# 🏷 Stocks with closed trades, for the filter dropdown (cached until the next trade write)
+def get_stock_list(user_id):
+    cache_key = user_cache_key("stock_list", user_id)
+    stock_list = cache_lookup("stock_list", cache_key)
+    if stock_list is None:
+        stock_list = [name for (name,) in trade_query(user_id, Trade.stock_name, status='Closed')
+                      .distinct().order_by(Trade.stock_name)]
+        cache.set(cache_key, stock_list, timeout=STOCK_LIST_CACHE_TIMEOUT)
+    return stock_list
+
 @trades_bp.route('/history', methods=['GET'])
 @login_required
 def trade_history():
-    stock_filter = request.args.get('stock', '').upper()
-    date_range = request.args.get('date_range')
-    sort_order = request.args.get('sort', 'desc')
-    strategy_filter = request.args.get('strategy_tag')
-
-
-    query = Trade.query.filter_by(user_id=current_user.id, status='Closed')
-
-    if stock_filter:
-        query = query.filter(Trade.stock_name == stock_filter)
-
-    if strategy_filter:
-        query = query.filter(Trade.strategy_tag == strategy_filter)
-
-
-    today = date.today()
-    if date_range == 'last_month':
-        start_date = today.replace(day=1) - timedelta(days=1)
-        start_date = start_date.replace(day=1)
-        query = query.filter(Trade.exit_date >= start_date)
-
-    elif date_range == 'last_3_months':
-        start_date = today - timedelta(days=90)
-        query = query.filter(Trade.exit_date >= start_date)
-
-    elif date_range == 'last_year':
-        start_date = today - timedelta(days=365)
-        query = query.filter(Trade.exit_date >= start_date)
-
-    trades = query.order_by(Trade.exit_date.desc()).all()
-
-    enriched = []
-    for trade in trades:
-        total_quantity = sum(e.quantity for e in trade.entries)
-        total_invested = sum(e.quantity * e.price for e in trade.entries)
-        avg_entry_price = round(total_invested / total_quantity, 2) if total_quantity else 0
-        
-        total_exited = sum(x.quantity * x.price for x in trade.exits)
-        avg_exit_price = round(total_exited / total_quantity, 2) if total_quantity else 0
-
-        realized_pnl = round(total_exited - total_invested, 2)
-        total_days = (trade.exit_date - trade.entry_date).days if trade.entry_date and trade.exit_date else 0
-        return_pct = round((realized_pnl / total_invested) * 100, 2) if total_invested else 0
-
-        entry_notes = [e.note for e in trade.entries if e.note]
-        exit_notes = [x.note for x in trade.exits if x.note]
-        combined_notes = " | ".join(entry_notes + exit_notes)
-
-        enriched.append({
-            'id': trade.id,  # ✅ Add this line to fetch trade.id in view button
-            'stock_name': trade.stock_name.upper(),
-            'entry_date': trade.entry_date,
-            'exit_date': trade.exit_date,
-            'avg_entry_price': avg_entry_price,
-            'avg_exit_price': avg_exit_price,
-            'total_quantity': total_quantity,
-            'total_invested': round(total_invested, 2),
-            'realized_pnl': realized_pnl,
-            'return_pct': return_pct,
-            'total_days': total_days,
-            'notes': combined_notes,
-            'strategy_tag': trade.strategy_tag
-        })
-
-    enriched.sort(key=lambda t: t['realized_pnl'], reverse=(sort_order == 'desc'))
-    stock_list = sorted(set(t.stock_name for t in trades))
+    filters = _history_filters(request.args)
+    cursor = request.args.get('cursor')
+    trades, next_cursor = _history_page(current_user.id, filters, cursor)
 
     return render_template('trade_history.html',
-                           trades=enriched,
-                           stock_list=stock_list,
-                           selected_stock=stock_filter,
-                           selected_range=date_range,
-                           sort=sort_order)
-
+                           trades=trades,
+                           stock_list=get_stock_list(current_user.id),
+                           selected_stock=filters['stock'],
+                           selected_range=filters['date_range'],
+                           selected_strategy=filters['strategy_tag'],
+                           sort=filters['sort'],
+                           page_size=filters['page_size'],
+                           cursor=cursor,
+                           next_cursor=next_cursor)
+
+# 📡 Same pages as JSON for infinite scroll: pass back next_cursor as ?cursor=
+@trades_bp.route('/history/data', methods=['GET'])
+@login_required
+def trade_history_data():
+    filters = _history_filters(request.args)
+    trades, next_cursor = _history_page(current_user.id, filters, request.args.get('cursor'))
+    for trade in trades:
+        trade['entry_date'] = trade['entry_date'].isoformat() if trade['entry_date'] else None
+        trade['exit_date'] = trade['exit_date'].isoformat() if trade['exit_date'] else None
+    return jsonify({'trades': trades, 'next_cursor': next_cursor})
+
+HISTORY_EXPORT_COLUMNS = ['Stock Name', 'Entry', 'Exit', 'Entry (Avg)', 'Exit (Avg)',
+                          'Quantity', 'Duration', 'Realized P&L', 'Notes']
+EXPORT_BATCH_SIZE = 1000
+
+# 📤 Export rows one trade at a time; yield_per streams from a server-side cursor in batches
+def _history_export_rows(user_id, filters):
+    for trade in _history_query(user_id, filters).yield_per(EXPORT_BATCH_SIZE):
+        row = _history_row(trade)
+        yield [
+            row['stock_name'],
+            row['entry_date'].strftime('%d-%b-%Y') if row['entry_date'] else '',
+            row['exit_date'].strftime('%d-%b-%Y') if row['exit_date'] else '',
+            row['avg_entry_price'],
+            row['avg_exit_price'],
+            row['total_quantity'],
+            f"{row['total_days']} days",
+            row['realized_pnl'],
+            row['notes'],
+        ]
+
+# /history/export?format=xlsx (default) or csv - memory stays flat regardless of trade count
 @trades_bp.route('/history/export')
 @login_required
+@etag_by_data_version("trades")
 def export_history():
-    stock_filter = request.args.get('stock', '').upper()
-    date_range = request.args.get('date_range')
-    sort_order = request.args.get('sort', 'desc')
-
-    query = Trade.query.filter_by(user_id=current_user.id, status='Closed')
-
-    if stock_filter:
-        query = query.filter(Trade.stock_name == stock_filter)
-
-    today = date.today()
-    if date_range == 'last_month':
-        start_date = today.replace(day=1) - timedelta(days=1)
-        start_date = start_date.replace(day=1)
-        query = query.filter(Trade.exit_date >= start_date)
-    elif date_range == 'last_3_months':
-        start_date = today - timedelta(days=90)
-        query = query.filter(Trade.exit_date >= start_date)
-    elif date_range == 'last_year':
-        start_date = today - timedelta(days=365)
-        query = query.filter(Trade.exit_date >= start_date)
-
-    trades = query.order_by(Trade.exit_date.desc()).all()
-
-    data = []
-    for trade in trades:
-        total_quantity = sum(e.quantity for e in trade.entries)
-        total_invested = sum(e.quantity * e.price for e in trade.entries)
-        avg_entry_price = round(total_invested / total_quantity, 2) if total_quantity else 0
-
-        total_exited = sum(x.quantity * x.price for x in trade.exits)
-        avg_exit_price = round(total_exited / total_quantity, 2) if total_quantity else 0
-
-        realized_pnl = round(total_exited - total_invested, 2)
-        total_days = (trade.exit_date - trade.entry_date).days if trade.entry_date and trade.exit_date else 0
-
-        entry_notes = [e.note for e in trade.entries if e.note]
-        exit_notes = [x.note for x in trade.exits if x.note]
-        combined_notes = " | ".join(entry_notes + exit_notes)
-        date_stamp = datetime.now().strftime('%d-%b-%Y')
-        filename = f"trades_{date_stamp}.xlsx"
-
-        data.append({
-            'Stock Name': trade.stock_name.upper(),
-            'Entry': trade.entry_date.strftime('%d-%b-%Y') if trade.entry_date else '',
-            'Exit': trade.exit_date.strftime('%d-%b-%Y') if trade.exit_date else '',
-            'Entry (Avg)': avg_entry_price,
-            'Exit (Avg)': avg_exit_price,
-            'Quantity': total_quantity,
-            'Duration': f"{total_days} days",
-            'Realized P&L': realized_pnl,
-            'Notes': combined_notes
-        })
-
-    # ✅ Export logic must be outside the loop
-    df = pd.DataFrame(data)
-
-    if sort_order == 'asc':
-        df = df.sort_values(by='Realized P&L', ascending=True)
-    else:
-        df = df.sort_values(by='Realized P&L', ascending=False)
-
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Trade History')
-
-    output.seek(0)
+    filters = _history_filters(request.args)
+    rows = _history_export_rows(current_user.id, filters)
+    date_stamp = datetime.now().strftime('%d-%b-%Y')
 
-    return send_file(output,
-                     download_name=filename,
-                 as_attachment=True,
-                 mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    if request.args.get('format') == 'csv':
+        return csv_response(f"trades_{date_stamp}.csv", HISTORY_EXPORT_COLUMNS, rows)
+    return xlsx_response(f"trades_{date_stamp}.xlsx", [('Trade History', HISTORY_EXPORT_COLUMNS, rows)])
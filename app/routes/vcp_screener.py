@@ -1,10 +1,11 @@
 # app/routes/vcp_screener.py
 import os
 import pandas as pd
-import yfinance as yf
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, redirect, url_for
 from datetime import datetime
 from scipy.signal import find_peaks
+from app.bar_store import get_bars
+from app.jobs import submit_job, job_result, report_progress
 
 # Create Blueprint
 vcp_bp = Blueprint("vcp", __name__, url_prefix="/vcp")
@@ -44,8 +45,7 @@ def get_contractions(hist, lookback=90):
 def analyze_vcp(ticker):
     """Analyze a single stock for VCP characteristics."""
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period="6mo")
+        hist = get_bars(ticker, days=182)
         if hist.empty or len(hist) < 40:
             return None
 
@@ -86,7 +86,8 @@ def analyze_vcp(ticker):
 def scan_universe(tickers):
     """Scan a list of tickers for VCP candidates."""
     results = []
-    for t in tickers:
+    for i, t in enumerate(tickers, start=1):
+        report_progress(i, len(tickers))
         res = analyze_vcp(t)
         if res and res["is_contracting"] and res["vol_dryup"]:
             results.append(res)
@@ -98,19 +99,26 @@ def scan_universe(tickers):
 
 @vcp_bp.route("/", methods=["GET"])
 def vcp_view():
-    """Render the VCP screener page with a process button."""
+    """Render the VCP screener page with a process button (or a finished job's results)."""
+    result = job_result(request.args.get("job"), "vcp")
+    if result:
+        return render_template("vcp.html", **result)
     return render_template("vcp.html")
 
 @vcp_bp.route("/process", methods=["POST"])
 def vcp_process():
-    """Run the VCP screener when the button is clicked."""
+    """Queue the VCP screener when the button is clicked."""
     path = "data/MCAPge250cr.csv"
     if not os.path.exists(path):
         return render_template("vcp.html", error=f"⚠️ Source file not found: {path}")
 
+    job = submit_job("vcp", run_vcp_screener, "vcp.vcp_view", path, "MCAPge250cr")
+    return redirect(url_for("jobs.job_page", job_id=job.id))
+
+def run_vcp_screener(path, source_name):
+    """VCP scan (background job) - returns the vcp.html context."""
     df = pd.read_csv(path)
     symbols = [s + ".NS" for s in df["symbol"].dropna().unique()]
-    source_name = "MCAPge250cr"
 
     # Run VCP scan
     results = scan_universe(symbols)
@@ -126,4 +134,4 @@ def vcp_process():
     last_processed_time = datetime.now().strftime("%d %b %Y %I:%M %p")
     summary_message = f"✅ Processed {len(enriched)} stocks from {source_name} at {last_processed_time}"
 
-    return render_template("vcp.html", results=enriched, summary=summary_message)
+    return dict(results=enriched, summary=summary_message)
@@ -0,0 +1,73 @@
+import csv
+import io
+import tempfile
+import xlsxwriter
+from flask import Response, stream_with_context
+
+# 📤 Streaming CSV / XLSX downloads
+#
+# Rows come from generators (ORM queries with yield_per), so memory stays flat
+# however many trades are exported. CSV is sent as it is produced. XLSX is a zip
+# and can only be sent once complete, so it is written with xlsxwriter's
+# constant_memory mode into a spooled temp file and then streamed in chunks
+# (file_response, also used for the Parquet export).
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 8 * 1024 * 1024  # small workbooks never touch the disk
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _attachment(filename):
+    return {"Content-Disposition": f"attachment; filename={filename}"}
+
+
+def csv_response(filename, header, rows):
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        yield buffer.getvalue()  # first byte goes out before the query runs
+        buffer.seek(0)
+        buffer.truncate()
+
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype="text/csv", headers=_attachment(filename))
+
+
+def xlsx_response(filename, sheets):
+    """sheets: [(name, header, rows)]; each sheet's rows are written one at a time, in order."""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd'})
+    bold = workbook.add_format({'bold': True})
+    for name, header, rows in sheets:
+        sheet = workbook.add_worksheet(name)
+        sheet.write_row(0, 0, header, bold)
+        for row_number, row in enumerate(rows, start=1):
+            sheet.write_row(row_number, 0, row)
+    workbook.close()
+    output.seek(0)
+    return file_response(output, filename, XLSX_MIMETYPE)
+
+
+def file_response(output, filename, mimetype):
+    """Stream a finished temp file in chunks, closing it afterwards."""
+    size = output.seek(0, 2)
+    output.seek(0)
+
+    def generate():
+        try:
+            while chunk := output.read(CHUNK_SIZE):
+                yield chunk
+        finally:
+            output.close()
+
+    headers = _attachment(filename)
+    headers["Content-Length"] = str(size)
+    return Response(generate(), mimetype=mimetype, headers=headers)
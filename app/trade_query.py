@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
+from app.extensions import db
+from app.models import Trade
+
+# 🔎 One place that turns request filters into SQL
+#
+# (range, stock, strategy_tag, status) become WHERE predicates, so stats, exports
+# and history only ever load trades inside the requested window. A range matches
+# closed trades by exit date and open trades by entry date.
+
+TRADE_PNL = Trade.exited_amount - Trade.invested_amount  # realized P&L of a closed trade
+
+
+# 📅 Range name -> (start, end) dates, both inclusive; (None, None) = all time
+def range_window(range_name, today=None):
+    today = today or date.today()
+    if range_name == 'last_7_days':
+        return today - timedelta(days=7), None
+    if range_name == 'last_30_days':
+        return today - timedelta(days=30), None
+    if range_name in ('last_90_days', 'last_3_months'):
+        return today - timedelta(days=90), None
+    if range_name == 'last_12_months':
+        return today - timedelta(days=365), None
+    if range_name == 'ytd':
+        return date(today.year, 1, 1), None
+    if range_name == 'last_month':
+        previous_month_end = today.replace(day=1) - timedelta(days=1)
+        return previous_month_end.replace(day=1), None
+    if range_name == 'last_year':
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)
+    return None, None
+
+
+def _within(column, start, end):
+    return column.between(start, end) if end else column >= start
+
+
+def trade_filters(user_id, range_name=None, stock=None, strategy_tag=None, status=None):
+    """WHERE predicates for the user's trades, for query.filter(*...)."""
+    predicates = [Trade.user_id == user_id]
+    if status:
+        predicates.append(Trade.status == status)
+    if stock:
+        predicates.append(Trade.stock_name == stock)
+    if strategy_tag:
+        predicates.append(Trade.strategy_tag == strategy_tag)
+
+    start, end = range_window(range_name)
+    if start:
+        if status == 'Closed':
+            predicates.append(_within(Trade.exit_date, start, end))
+        elif status == 'Open':
+            predicates.append(_within(Trade.entry_date, start, end))
+        else:
+            predicates.append(or_(
+                and_(Trade.status == 'Closed', _within(Trade.exit_date, start, end)),
+                and_(Trade.status == 'Open', _within(Trade.entry_date, start, end)),
+            ))
+    return predicates
+
+
+def trade_query(user_id, *columns, range_name=None, stock=None, strategy_tag=None, status=None, eager=False):
+    """Filtered query of Trade rows (entries/exits selectin-loaded with eager=True),
+    or of the given columns / aggregate expressions."""
+    filters = trade_filters(user_id, range_name, stock, strategy_tag, status)
+    if columns:
+        return db.session.query(*columns).filter(*filters)
+    query = Trade.query.filter(*filters)
+    if eager:
+        query = query.options(selectinload(Trade.entries), selectinload(Trade.exits))
+    return query
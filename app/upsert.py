@@ -0,0 +1,64 @@
+import numpy as np
+from sqlalchemy import literal_column, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from app.extensions import db
+
+# 💾 Bulk upsert for the daily screener tables
+#
+# One INSERT ... ON CONFLICT (symbol, date) DO UPDATE per batch instead of a
+# SELECT + INSERT/UPDATE per row. PostgreSQL reports inserted vs updated rows
+# through RETURNING (xmax = 0); the SQLite fallback counts the existing keys
+# with one SELECT per batch. Needs a unique constraint on the key columns.
+
+BATCH_SIZE = 500
+
+
+def _plain(value):
+    """psycopg2 can't adapt numpy scalars."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def upsert_rows(model, rows, keys=("symbol", "date"), batch_size=BATCH_SIZE):
+    """Insert or update `rows` (list of column dicts). Returns (updated, inserted)."""
+    if not rows:
+        return 0, 0
+
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        raise NotImplementedError(f"upsert_rows does not support {dialect}")
+
+    rows = [{column: _plain(value) for column, value in row.items()} for row in rows]
+    # Last row wins when a batch repeats a key - ON CONFLICT can't touch a row twice
+    rows = list({tuple(row[k] for k in keys): row for row in rows}.values())
+    update_columns = [c for c in rows[0] if c not in keys]
+
+    updated = inserted = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        stmt = insert(table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: stmt.excluded[column] for column in update_columns},
+        )
+
+        if dialect == "postgresql":
+            flags = db.session.execute(stmt.returning(literal_column("(xmax = 0)"))).scalars().all()
+            batch_inserted = sum(1 for flag in flags if flag)
+        else:
+            key_columns = [table.c[k] for k in keys]
+            existing = db.session.execute(
+                select(*key_columns).where(tuple_(*key_columns).in_([tuple(row[k] for k in keys) for row in batch]))
+            ).all()
+            db.session.execute(stmt)
+            batch_inserted = len(batch) - len(existing)
+
+        inserted += batch_inserted
+        updated += len(batch) - batch_inserted
+
+    db.session.commit()
+    return updated, inserted
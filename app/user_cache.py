@@ -0,0 +1,78 @@
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+from flask import current_app, request
+from flask_login import current_user
+from prometheus_client import Counter
+from app.extensions import cache, metrics
+
+# 🗝 Per-user cache generations
+#
+# Every cached per-user value is stored under a key that embeds the user's
+# current generation. Trade writes bump the generation, so old entries are never
+# read again (they just age out) and the TTL can be long without serving stale data.
+# Other per-user datasets (resources) keep their own generation, which doubles as
+# the data version behind the ETags of their pages and exports.
+
+CACHE_REQUESTS = Counter(
+    "app_cache_requests_total", "Per-user cache lookups by namespace and result",
+    ["namespace", "result"], registry=metrics.registry,
+)
+
+
+def _generation_key(user_id, dataset):
+    return f"gen:{user_id}" if dataset == "trades" else f"gen:{dataset}:{user_id}"
+
+
+def cache_generation(user_id, dataset="trades"):
+    generation = cache.get(_generation_key(user_id, dataset))
+    if generation is None:
+        # Start from a fresh value (not 0) so an evicted counter can't revive old keys
+        cache.add(_generation_key(user_id, dataset), time.time_ns(), timeout=0)
+        generation = cache.get(_generation_key(user_id, dataset))
+    return generation
+
+
+# 🔄 Call after committing any write that changes the user's trades (or another dataset)
+def bump_cache_generation(user_id, dataset="trades"):
+    cache.set(_generation_key(user_id, dataset), time.time_ns(), timeout=0)
+
+
+def user_cache_key(namespace, user_id, *parts):
+    return ":".join([namespace, str(user_id), str(cache_generation(user_id)), *map(str, parts)])
+
+
+def cache_lookup(namespace, key):
+    """cache.get() that counts hits and misses per namespace."""
+    value = cache.get(key)
+    CACHE_REQUESTS.labels(namespace=namespace, result="miss" if value is None else "hit").inc()
+    return value
+
+
+# 🏷 Strong ETag: endpoint + user + today's date (relative ranges) + dataset versions + query args
+def data_etag(user_id, datasets):
+    parts = [request.endpoint, str(user_id), date.today().isoformat()]
+    parts += [f"{dataset}={cache_generation(user_id, dataset)}" for dataset in datasets]
+    parts += [f"{key}={value}" for key, value in sorted(request.args.items(multi=True))]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def etag_by_data_version(*datasets):
+    """Answer If-None-Match with 304 before the view runs a query; tag 200 responses.
+    Goes under @login_required."""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            etag = data_etag(current_user.id, datasets)
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapped
+    return decorator
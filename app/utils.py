@@ -1,29 +1,52 @@
 from datetime import date, timedelta
+from sqlalchemy import case, func
 from app.models import Trade
+from app.extensions import db, cache
+from app.user_cache import cache_lookup, user_cache_key
 import yfinance as yf
 
-def get_pl_summary(user_id):
-    today = date.today()
-    start_month = today.replace(day=1)
-    start_3m = today - timedelta(days=90)
-    start_q = today.replace(month=((today.month - 1)//3)*3 + 1, day=1)
-    start_year = today.replace(month=1, day=1)
-
-    def sum_pl(start):
-        trades = Trade.query.filter(
-            Trade.user_id == user_id,
-            Trade.status.ilike('closed'),
-            Trade.exit_date >= start
-        ).all()
-        return sum(t.pnl for t in trades)
+PL_SUMMARY_CACHE_TIMEOUT = 6 * 60 * 60  # keys carry the user's cache generation and today's date
+
+def fiscal_year_start(today):
+    """April 1st of the current Indian financial year."""
+    return date(today.year if today.month >= 4 else today.year - 1, 4, 1)
 
+def pl_windows(today):
     return {
-        'this_month': round(sum_pl(start_month), 2),
-        'last_3_months': round(sum_pl(start_3m), 2),
-        'quarter': round(sum_pl(start_q), 2),
-        'year': round(sum_pl(start_year), 2)
+        'this_month': today.replace(day=1),
+        'last_3_months': today - timedelta(days=90),
+        'quarter': today.replace(month=((today.month - 1)//3)*3 + 1, day=1),
+        'year': today.replace(month=1, day=1),
     }
 
+# 💰 Realized P&L since each window start, all windows in one conditional-aggregate query
+def get_pl_summary(user_id, extra_windows=None):
+    """
+    extra_windows: {name: start_date} added to the standard four at no extra query cost,
+    e.g. {'fy_to_date': fiscal_year_start(today), 'last_52_weeks': today - timedelta(weeks=52)}.
+    """
+    today = date.today()
+    windows = {**pl_windows(today), **(extra_windows or {})}
+
+    cache_key = user_cache_key("pl_summary", user_id, today, *sorted(f"{name}={start}" for name, start in windows.items()))
+    summary = cache_lookup("pl_summary", cache_key)
+    if summary is not None:
+        return summary
+
+    pnl = Trade.exited_amount - Trade.invested_amount  # entry/exit sums kept on the trade row
+    row = db.session.query(*[
+        func.coalesce(func.sum(case((Trade.exit_date >= start, pnl), else_=0)), 0)
+        for start in windows.values()
+    ]).filter(
+        Trade.user_id == user_id,
+        Trade.status == "Closed",
+        Trade.exit_date >= min(windows.values()),
+    ).one()
+
+    summary = {name: round(float(total), 2) for name, total in zip(windows, row)}
+    cache.set(cache_key, summary, timeout=PL_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
 def get_current_price(symbol, suffix=".NS"):
     try:
         ticker = yf.Ticker(symbol + suffix)
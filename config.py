@@ -17,6 +17,21 @@ class Config:
     PROPAGATE_EXCEPTIONS = True
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
+    # Screener data fetching: 'per_symbol' or 'batched' (multi-ticker yf.download)
+    STAGE2_FETCH_MODE = os.getenv('STAGE2_FETCH_MODE', 'per_symbol')
+    SCREENER_CHUNK_SIZE = int(os.getenv('SCREENER_CHUNK_SIZE', 100))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # background screener job threads
+    JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', 3600))  # seconds before a queued/running job counts as dead
+
+    # Shared cache for all workers: FileSystemCache (default) or app.cache_backends.SQLiteCache
+    # work offline on one box; RedisCache uses CACHE_REDIS_URL (needs `pip install redis`)
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'FileSystemCache')
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join('data', 'cache'))
+    CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH', os.path.join('data', 'cache.sqlite3'))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', 5000))  # max entries before eviction
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 3600))
+
 
     MAIL_SERVER = os.getenv('MAIL_SERVER')
     MAIL_PORT = int(os.getenv('MAIL_PORT'))
@@ -18,7 +18,13 @@ CREATE TABLE public.trades (
     strategy_tag VARCHAR(50),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     user_id INTEGER NOT NULL REFERENCES public.users(id),
-    status VARCHAR(10) DEFAULT 'Open' NOT NULL
+    status VARCHAR(10) DEFAULT 'Open' NOT NULL,
+    total_buy_qty INT NOT NULL DEFAULT 0,
+    total_sell_qty INT NOT NULL DEFAULT 0,
+    invested_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+    exited_amount DOUBLE PRECISION NOT NULL DEFAULT 0,
+    avg_entry_price DOUBLE PRECISION NOT NULL DEFAULT 0,
+    realized_pnl DOUBLE PRECISION NOT NULL DEFAULT 0
 );
 
 CREATE TABLE public.trade_entries (
@@ -91,7 +97,8 @@ CREATE TABLE stage2_stocks (
     ma_30w NUMERIC(10, 2),
     volume BIGINT,
     vol_avg BIGINT,
-    rs NUMERIC(10, 2)
+    rs NUMERIC(10, 2),
+    CONSTRAINT uq_stage2_stocks_symbol_date UNIQUE (symbol, date)
 );
 
 CREATE TABLE momentum_portfolio (
@@ -122,7 +129,8 @@ CREATE TABLE delivery_surge_stock (
     volume BIGINT,
     delivery_spike FLOAT,
     roc_21d FLOAT,
-    rs_vs_index_21d FLOAT
+    rs_vs_index_21d FLOAT,
+    CONSTRAINT uq_delivery_surge_stock_symbol_date UNIQUE (symbol, date)
 );
 
 CREATE TABLE stage2_delivery_stock (
@@ -133,7 +141,8 @@ CREATE TABLE stage2_delivery_stock (
     volume BIGINT,
     delivery_spike FLOAT,
     roc_21d FLOAT,
-    rs_vs_index_21d FLOAT
+    rs_vs_index_21d FLOAT,
+    CONSTRAINT uq_stage2_delivery_stock_symbol_date UNIQUE (symbol, date)
 );
 
 CREATE TABLE eps_screener_results (
@@ -152,3 +161,51 @@ CREATE TABLE eps_screener_results (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE TABLE screener_jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    progress INT DEFAULT 0,
+    processed INT DEFAULT 0,
+    total INT DEFAULT 0,
+    errors TEXT,
+    result TEXT,
+    result_endpoint VARCHAR(100),
+    user_id INTEGER REFERENCES public.users(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE screener_persistence (
+    screener VARCHAR(30) NOT NULL,
+    symbol VARCHAR(20) NOT NULL,
+    days_present INT NOT NULL DEFAULT 0,
+    current_streak INT NOT NULL DEFAULT 0,
+    first_seen DATE,
+    last_seen DATE,
+    PRIMARY KEY (screener, symbol)
+);
+
+CREATE TABLE user_daily_pnl (
+    user_id INTEGER NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    exit_date DATE NOT NULL,
+    realized_pnl DOUBLE PRECISION NOT NULL DEFAULT 0,
+    trade_count INT NOT NULL DEFAULT 0,
+    win_count INT NOT NULL DEFAULT 0,
+    gross_profit DOUBLE PRECISION NOT NULL DEFAULT 0,
+    gross_loss DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, exit_date)
+);
+
+CREATE INDEX ix_trades_user_status_exit_date ON trades (user_id, status, exit_date);
+CREATE INDEX ix_trades_user_status_pnl ON trades (user_id, status, (exited_amount - invested_amount), id);
+CREATE INDEX ix_trade_entries_trade_id ON trade_entries (trade_id);
+CREATE INDEX ix_trade_exits_trade_id ON trade_exits (trade_id);
+CREATE INDEX ix_day_notes_user_date ON day_notes (user_id, date);
+CREATE INDEX ix_watchlist_user_date_added ON watchlist (user_id, date_added);
+CREATE INDEX ix_resources_user_pinned ON resources (user_id, pinned);
+CREATE INDEX ix_stage2_stocks_date ON stage2_stocks (date);
+CREATE INDEX ix_delivery_surge_stock_date ON delivery_surge_stock (date);
+CREATE INDEX ix_stage2_delivery_stock_date ON stage2_delivery_stock (date);
+CREATE INDEX ix_screener_jobs_created_at ON screener_jobs (created_at);
@@ -0,0 +1,56 @@
+import os
+import re
+import pytest
+
+# 🧪 Test settings - config.py reads the environment at import, so set it first
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("MAIL_PORT", "25")
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+os.environ["CACHE_TYPE"] = "SimpleCache"
+
+from app import create_app
+from app.extensions import cache, db
+from app.models import User
+
+
+@pytest.fixture(scope="session")
+def app():
+    # One app per session: the Prometheus exporter registers its metrics process-wide
+    app = create_app()
+    app.config.update(TESTING=True)
+    return app
+
+
+# Fixtures leave no app context pushed, so every test-client request gets its own (and a fresh session)
+@pytest.fixture()
+def database(app):
+    with app.app_context():
+        db.create_all()
+        cache.clear()
+    yield db
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture()
+def user_id(app, database):
+    with app.app_context():
+        user = User(username="trader", email="trader@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+def login(client, username="trader", password="secret"):
+    """Log in through the real form (the view validates its CSRF token itself)."""
+    page = client.get("/login").get_data(as_text=True)
+    token = re.search(r'name="csrf_token" value="([^"]+)"', page).group(1)
+    response = client.post("/login", data={"csrf_token": token, "username": username, "password": password})
+    assert response.status_code == 302 and "/login" not in response.headers["Location"]
+    return response
@@ -0,0 +1,34 @@
+import uuid
+from app.extensions import db
+from app.models import ScreenerJob
+from app.routes import export
+from conftest import login
+
+
+def test_pdf_export_joins_the_build_in_progress(app, user_id, client, monkeypatch):
+    submitted = []
+
+    def queue_only(kind, func, result_endpoint, *args):
+        job = ScreenerJob(id=uuid.uuid4().hex, kind=kind, status="queued",
+                          result_endpoint=result_endpoint, user_id=user_id)
+        db.session.add(job)
+        db.session.commit()
+        submitted.append(args)
+        return job
+
+    monkeypatch.setattr(export, "submit_job", queue_only)
+    login(client)
+
+    first = client.get("/export?format=pdf&range=all_time")
+    assert first.status_code == 302 and "/jobs/" in first.headers["Location"]
+    assert client.get("/export?format=pdf&range=all_time").headers["Location"] == first.headers["Location"]
+    assert len(submitted) == 1
+
+    # Another range is another report; a build that died is started again
+    client.get("/export?format=pdf&range=ytd")
+    assert len(submitted) == 2
+    with app.app_context():
+        db.session.get(ScreenerJob, first.headers["Location"].rsplit("/", 1)[1]).status = "failed"
+        db.session.commit()
+    assert client.get("/export?format=pdf&range=all_time").headers["Location"] != first.headers["Location"]
+    assert len(submitted) == 3
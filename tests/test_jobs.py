@@ -0,0 +1,110 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+from app.extensions import db
+from flask_login import login_user
+from app.jobs import _run_job, fail_stale_jobs, job_result
+from app.models import ScreenerJob, User
+from conftest import login
+
+
+def add_job(app, user_id=None, **fields):
+    with app.app_context():
+        job = ScreenerJob(id=uuid.uuid4().hex, kind="stage2", result_endpoint="screener.stage2_view",
+                          user_id=user_id, **fields)
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def add_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_job_pages_require_login(app, user_id, client):
+    job_id = add_job(app, user_id)
+    for url in (f"/jobs/{job_id}", f"/jobs/{job_id}/status"):
+        response = client.get(url)
+        assert response.status_code == 302 and "/login" in response.headers["Location"]
+
+
+def test_jobs_are_only_visible_to_their_owner(app, user_id, client):
+    own_job = add_job(app, user_id)
+    shared_job = add_job(app)  # started without a login
+    other_job = add_job(app, add_user(app, "other"))
+    login(client)
+
+    for job_id in (own_job, shared_job):
+        assert client.get(f"/jobs/{job_id}").status_code == 200
+        assert client.get(f"/jobs/{job_id}/status").get_json()["status"] == "queued"
+    for url in (f"/jobs/{other_job}", f"/jobs/{other_job}/status", "/jobs/missing/status"):
+        assert client.get(url).status_code == 404
+
+
+def test_job_result_checks_owner_and_kind(app, user_id):
+    result = {"stocks": []}
+    own_job = add_job(app, user_id, status="finished", result=json.dumps(result))
+    shared_job = add_job(app, status="finished", result=json.dumps(result))
+    other_job = add_job(app, add_user(app, "other"), status="finished", result=json.dumps(result))
+
+    with app.test_request_context():
+        assert job_result(shared_job, "stage2") == result
+        assert job_result(own_job, "stage2") is None  # anonymous visitor
+        login_user(db.session.get(User, user_id))
+        assert job_result(own_job, "stage2") == result
+        assert job_result(own_job, "pdf_report") is None
+        assert job_result(other_job, "stage2") is None
+
+
+def test_status_fails_jobs_past_the_timeout(app, user_id, client):
+    long_ago = datetime.utcnow() - timedelta(seconds=app.config["JOB_TIMEOUT"] + 60)
+    dead_job = add_job(app, user_id, status="running", created_at=long_ago, started_at=long_ago)
+    live_job = add_job(app, user_id, status="running", created_at=long_ago, started_at=datetime.utcnow())
+    login(client)
+
+    status = client.get(f"/jobs/{dead_job}/status").get_json()
+    assert status["status"] == "failed" and "stopped responding" in status["errors"][0]
+    assert client.get(f"/jobs/{live_job}/status").get_json()["status"] == "running"
+
+
+def test_stale_sweep_only_touches_old_unfinished_jobs(app, database):
+    long_ago = datetime.utcnow() - timedelta(hours=2)
+    queued = add_job(app, status="queued", created_at=long_ago)
+    finished = add_job(app, status="finished", created_at=long_ago, started_at=long_ago)
+    fresh = add_job(app, status="queued")
+
+    with app.app_context():
+        assert fail_stale_jobs(3600) == 1
+        assert {job.id: job.status for job in ScreenerJob.query} == {
+            queued: "failed", finished: "finished", fresh: "queued"}
+        assert db.session.get(ScreenerJob, queued).finished_at is not None
+
+
+def test_run_job_does_not_revive_a_job_failed_as_stale(app, database):
+    def outlived_its_timeout():
+        fail_stale_jobs(0)  # the status poll gave up on it while it was still working
+        return {"stocks": ["LATE"]}
+
+    finished, revived = add_job(app), add_job(app)
+    _run_job(app, finished, lambda: {"stocks": []}, ())
+    _run_job(app, revived, outlived_its_timeout, ())
+
+    with app.app_context():
+        assert db.session.get(ScreenerJob, finished).status == "finished"
+        job = db.session.get(ScreenerJob, revived)
+        assert job.status == "failed" and job.result is None and "stopped responding" in job.errors
+
+
+def test_run_job_skips_a_job_failed_before_it_started(app, database):
+    calls = []
+    job_id = add_job(app, status="failed")
+    _run_job(app, job_id, lambda: calls.append(1), ())
+
+    assert calls == []
+    with app.app_context():
+        assert db.session.get(ScreenerJob, job_id).started_at is None
@@ -0,0 +1,11 @@
+from sqlalchemy import inspect
+from app.extensions import db
+
+
+def test_db_upgrade_refuses_sqlite_before_touching_it(app, database):
+    result = app.test_cli_runner().invoke(args=["db-upgrade"])
+
+    assert result.exit_code == 1
+    assert "db-upgrade needs PostgreSQL, this database is sqlite" in result.output
+    with app.app_context():
+        assert "schema_migrations" not in inspect(db.engine).get_table_names()
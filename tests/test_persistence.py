@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+from app.extensions import cache, db
+from app.models import Stage2Stock
+from app.persistence import PURGE_MARKER, get_persistence, purge_screener_rows, record_screener_run
+
+
+def purged_on(days_ago):
+    cache.set(PURGE_MARKER.format("stage2"), (date.today() - timedelta(days=days_ago)).isoformat())
+
+
+def run_stage2(symbols, days_ago):
+    day = date.today() - timedelta(days=days_ago)
+    db.session.add_all(Stage2Stock(symbol=symbol, date=day) for symbol in symbols)
+    db.session.commit()
+    record_screener_run("stage2", symbols, day)
+
+
+def test_reads_drop_days_outside_the_window_without_a_screener_run(app, database):
+    with app.app_context():
+        purged_on(days_ago=0)  # the old rows aged out after today's purge
+        run_stage2(["OLD", "BOTH"], days_ago=40)
+        run_stage2(["BOTH"], days_ago=35)
+        run_stage2(["BOTH", "NEW"], days_ago=2)
+        assert get_persistence("stage2")["BOTH"].days_present == 3
+
+        purged_on(days_ago=1)  # next day, no screener run since
+        persistence = get_persistence("stage2")
+        assert {symbol: p.days_present for symbol, p in persistence.items()} == {"BOTH": 1, "NEW": 1}
+        assert Stage2Stock.query.count() == 2
+
+
+def test_purge_only_subtracts_rows_it_deleted(app, database):
+    with app.app_context():
+        run_stage2(["A"], days_ago=45)
+        run_stage2(["A"], days_ago=1)
+        assert purge_screener_rows("stage2") == 1
+        assert purge_screener_rows("stage2") == 0
+        assert get_persistence("stage2")["A"].days_present == 1
@@ -0,0 +1,81 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+from sqlalchemy import event
+from app.extensions import cache, db
+from app.models import Trade, TradeEntry, TradeExit
+from conftest import login
+
+# 🔢 The trade pages must not issue queries per trade (N+1): the statement count
+# of each endpoint is the same for N and 10 x N trades.
+
+SMALL = 20
+ENDPOINTS = ["/dashboard", "/history", "/history/export", "/history/export?format=csv"]
+
+
+def seed_trades(user_id, count):
+    """count trades with two entries and one exit each; every other trade is closed."""
+    trades, entries, exits = [], [], []
+    for trade_id in range(1, count + 1):
+        entry_date = date(2025, 1, 1) + timedelta(days=trade_id % 300)
+        closed = trade_id % 2 == 0
+        sold = 20 if closed else 10
+        trades.append(dict(
+            id=trade_id, user_id=user_id, stock_name=f"STOCK{trade_id % 25}", strategy_tag="breakout",
+            status="Closed" if closed else "Open", entry_date=entry_date,
+            exit_date=entry_date + timedelta(days=5) if closed else None,
+            total_buy_qty=20, total_sell_qty=sold, invested_amount=2010.0, exited_amount=sold * 110.0,
+            avg_entry_price=100.5, realized_pnl=sold * 9.5,
+        ))
+        for price in (100.0, 101.0):
+            # amounts are generated columns in PostgreSQL; create_all makes them plain ones here
+            entries.append(dict(trade_id=trade_id, quantity=10, price=price, date=entry_date,
+                                invested_amount=10 * price, note="entry"))
+        exits.append(dict(trade_id=trade_id, quantity=sold, price=110.0, date=entry_date + timedelta(days=5),
+                          exit_amount=sold * 110.0, note="exit"))
+    db.session.execute(Trade.__table__.insert(), trades)
+    db.session.execute(TradeEntry.__table__.insert(), entries)
+    db.session.execute(TradeExit.__table__.insert(), exits)
+    db.session.commit()
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def endpoint_query_counts(app, client):
+    with app.app_context():
+        engine = db.engine
+    counts = {}
+    for url in ENDPOINTS:
+        with app.app_context():
+            cache.clear()  # a cached stock list would hide its query on the second size
+        with count_queries(engine) as statements:
+            response = client.get(url)
+            response.get_data()  # exports are streamed: their queries run while the body is read
+        assert response.status_code == 200, url
+        counts[url] = len(statements)
+    return counts
+
+
+def test_trade_pages_issue_constant_queries(app, user_id, client):
+    login(client)
+    with app.app_context():
+        seed_trades(user_id, SMALL)
+    small = endpoint_query_counts(app, client)
+
+    with app.app_context():
+        for model in (TradeExit, TradeEntry, Trade):
+            db.session.query(model).delete()
+        db.session.commit()
+        seed_trades(user_id, 10 * SMALL)
+    assert endpoint_query_counts(app, client) == small
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.routes import screener
+from app.routes.stage2_engine import rank_stage2, screen_stage2_panel
+
+# 🧠 The vectorized panel screen must return exactly what the per-symbol
+# is_stage2() / evaluate_stage2() loop returns - same symbols, order and values.
+
+WEEKS = 60
+BENCHMARK = "^NSEI"
+
+
+def _leader(weeks):
+    """Steady outperformer with a volume spike on its latest bar - passes every rule."""
+    close = 100 * 1.01 ** np.arange(weeks)
+    volume = np.full(weeks, 1_000.0)
+    volume[-1] = 3_000.0
+    return close, volume
+
+
+@pytest.fixture()
+def panel():
+    rng = np.random.default_rng(7)
+    weeks = pd.date_range("2024-01-07", periods=WEEKS, freq="W")
+    bench = pd.Series(1_000 * 1.002 ** np.arange(WEEKS) + rng.normal(0, 2, WEEKS), index=weeks)
+    close, volume = {}, {}
+
+    # Random walks: some pass, most fail one rule or another
+    for i in range(24):
+        close[f"RAND{i}"] = 100 * np.exp(np.cumsum(rng.normal(0.004, 0.03, WEEKS)))
+        volume[f"RAND{i}"] = rng.lognormal(10, 0.4, WEEKS).round()
+
+    close["LEADER"], volume["LEADER"] = _leader(WEEKS)
+    # Identical series -> identical rs: ties keep column order
+    close["TWIN_A"], volume["TWIN_A"] = _leader(WEEKS)
+    close["TWIN_B"], volume["TWIN_B"] = _leader(WEEKS)
+
+    # Listed late: 15 leading NaNs, still 45 valid weeks
+    close["LATE"], volume["LATE"] = _leader(WEEKS)
+    close["LATE"][:15] = np.nan
+    volume["LATE"][:15] = np.nan
+
+    # Suspended: trailing NaNs, it is screened on its last traded week
+    close["HALTED"], volume["HALTED"] = _leader(WEEKS - 3)
+    close["HALTED"] = np.append(close["HALTED"], [np.nan] * 3)
+    volume["HALTED"] = np.append(volume["HALTED"], [np.nan] * 3)
+
+    # Missing volume on one week only drops that week
+    close["GAPPY"], volume["GAPPY"] = _leader(WEEKS)
+    volume["GAPPY"][40] = np.nan
+
+    # Would pass the rules, but has fewer than 35 weeks of history
+    close["SHORT"], volume["SHORT"] = _leader(WEEKS)
+    close["SHORT"][:WEEKS - 34] = np.nan
+    volume["SHORT"][:WEEKS - 34] = np.nan
+
+    # The benchmark itself: rs is flat, never rising
+    close[BENCHMARK], volume[BENCHMARK] = bench.to_numpy(), np.full(WEEKS, 5_000.0)
+
+    return pd.DataFrame(close, index=weeks), pd.DataFrame(volume, index=weeks), bench
+
+
+def _per_symbol(close, volume, bench, monkeypatch):
+    """The original loop: is_stage2() per symbol on that symbol's own bars, then rank."""
+    frames = {
+        symbol: pd.DataFrame({"Close": close[symbol], "Volume": volume[symbol]}).dropna()
+        for symbol in close.columns
+    }
+    monkeypatch.setattr(screener, "fetch_weekly_data", lambda symbol, session=None: frames[symbol].copy())
+    index_df = pd.DataFrame({"Close": bench})
+    rows = [data for symbol in close.columns if (data := screener.is_stage2(symbol, index_df=index_df))]
+    return rank_stage2(pd.DataFrame(rows))
+
+
+def test_panel_matches_per_symbol_screen(panel, monkeypatch):
+    close, volume, bench = panel
+    expected = _per_symbol(close, volume, bench, monkeypatch)
+    result = screen_stage2_panel(close, volume, bench)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert list(result.columns) == ["symbol", "price", "30w_ma", "volume", "vol_avg", "rs", "rank"]
+
+    symbols = list(result["symbol"])
+    assert {"LEADER", "TWIN_A", "TWIN_B", "LATE", "HALTED", "GAPPY"} <= set(symbols)
+    assert "SHORT" not in symbols and BENCHMARK not in symbols
+    assert symbols.index("TWIN_B") == symbols.index("TWIN_A") + 1
+    assert len(symbols) < len(close.columns)
+
+
+def test_panel_handles_timezones_and_unsorted_weeks(panel, monkeypatch):
+    close, volume, bench = panel
+    expected = _per_symbol(close, volume, bench, monkeypatch)
+
+    shuffled = close.sample(frac=1, random_state=1)
+    result = screen_stage2_panel(shuffled.tz_localize("Asia/Kolkata"), volume.tz_localize("Asia/Kolkata"), bench)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_panel_without_passing_symbols_is_empty(panel):
+    close, volume, bench = panel
+    assert screen_stage2_panel(close.iloc[:20], volume.iloc[:20], bench).empty
+    assert screen_stage2_panel(close.iloc[:0], volume.iloc[:0], bench).empty